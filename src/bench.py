@@ -0,0 +1,199 @@
+# ./src/bench.py
+import argparse
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+import pygame
+from src.simulation import Simulation, material_id
+from src.simulation.backend import BACKENDS, load_backend, load_numba_backend, numpy_backend
+from src.renderer import Renderer
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+DUST = material_id("dust")
+WATER = material_id("water")
+LAVA = material_id("lava")
+ICE = material_id("ice")
+
+def setup_avalanche(simulation, rng):
+    grid = simulation.grid
+    # A tall block of dust over a shelf-free floor collapses into one big pile
+    top, bottom = grid.height // 10, grid.height // 2
+    left, right = grid.width // 4, grid.width * 3 // 4
+    grid.material[top:bottom, left:right] = DUST
+    return None
+
+def setup_full_fill(simulation, rng):
+    grid = simulation.grid
+    # Every other cell filled, so the whole world is active from tick one
+    grid.material[:, :] = np.where(rng.random((grid.height, grid.width)) < 0.5, DUST, 0)
+    return None
+
+def setup_drizzle(simulation, rng):
+    grid = simulation.grid
+    drops_per_tick = max(1, grid.width // 20)
+
+    def drizzle(tick):
+        xs = rng.integers(0, grid.width, drops_per_tick)
+        simulation.paint_cells(np.zeros_like(xs), xs, DUST)
+
+    return drizzle
+
+def setup_flood(simulation, rng):
+    grid = simulation.grid
+    # The top half of the world is water that crashes down and levels out
+    grid.material[:grid.height // 2, :] = WATER
+    return None
+
+def setup_hot_spring(simulation, rng):
+    grid = simulation.grid
+    # Lava pours into a pool with ice floating on it, so heat, boiling and
+    # freezing all run alongside movement
+    pool = grid.height * 2 // 3
+    simulation.paint_mask(0, pool, np.ones((grid.height - pool, grid.width), dtype=bool), WATER)
+    simulation.paint_mask(grid.width // 8, pool - 4, np.ones((4, grid.width // 4), dtype=bool), ICE)
+    simulation.paint_mask(grid.width // 2, grid.height // 10, np.ones((grid.height // 5, grid.width // 4), dtype=bool), LAVA)
+    return None
+
+SCENARIOS = {
+    "avalanche": setup_avalanche,
+    "full_fill": setup_full_fill,
+    "drizzle": setup_drizzle,
+    "flood": setup_flood,
+    "hot_spring": setup_hot_spring,
+}
+
+def percentile_ms(samples, percentile):
+    return float(np.percentile(samples, percentile) * 1000) if len(samples) else 0.0
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes everywhere else
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def run_scenario(name, args):
+    rng = np.random.default_rng(args.seed)
+    simulation = Simulation(args.width, args.height, seed=args.seed, workers=args.workers,
+                            heat_interval=args.heat_interval, backend=load_backend(args.backend))
+    screen = pygame.display.set_mode((args.width * args.cell_size, args.height * args.cell_size))
+    renderer = Renderer(args.width, args.height)
+    per_tick = SCENARIOS[name](simulation, rng)
+
+    tick_times = []
+    render_times = []
+    start = time.perf_counter()
+    for tick in range(args.ticks):
+        if per_tick is not None:
+            per_tick(tick)
+        tick_start = time.perf_counter()
+        simulation.step()
+        tick_end = time.perf_counter()
+        renderer.draw(simulation.grid, simulation.chunks)
+        renderer.present(screen)
+        render_end = time.perf_counter()
+        tick_times.append(tick_end - tick_start)
+        render_times.append(render_end - tick_end)
+    elapsed = time.perf_counter() - start
+    simulation.close()
+
+    total_tick_time = sum(tick_times)
+    return {
+        "scenario": name,
+        "ticks": args.ticks,
+        "grid": [args.width, args.height],
+        "seed": args.seed,
+        "workers": args.workers,
+        "heat_interval": args.heat_interval,
+        "backend": simulation.kernels.name,
+        "ticks_per_sec": args.ticks / total_tick_time if total_tick_time else 0.0,
+        "tick_ms": {
+            "p50": percentile_ms(tick_times, 50),
+            "p95": percentile_ms(tick_times, 95),
+            "p99": percentile_ms(tick_times, 99),
+        },
+        "render_ms": {
+            "p50": percentile_ms(render_times, 50),
+            "p95": percentile_ms(render_times, 95),
+            "p99": percentile_ms(render_times, 99),
+        },
+        "frames_per_sec": args.ticks / elapsed if elapsed else 0.0,
+        "particles": simulation.count_particles(),
+        "awake_chunks": simulation.count_awake_chunks(),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def verify_scenario(name, args):
+    # Both backends must produce bit-identical grids from the same start
+    grids = []
+    for backend in (numpy_backend, load_numba_backend()):
+        simulation = Simulation(args.width, args.height, seed=args.seed, workers=args.workers,
+                                heat_interval=args.heat_interval, backend=backend)
+        per_tick = SCENARIOS[name](simulation, np.random.default_rng(args.seed))
+        for tick in range(args.ticks):
+            if per_tick is not None:
+                per_tick(tick)
+            simulation.step()
+        simulation.close()
+        grids.append(dict(zip(("material", "velocity_x", "velocity_y", "temperature"), simulation.grid.planes())))
+    mismatched = [plane for plane in grids[0] if not np.array_equal(grids[0][plane], grids[1][plane])]
+    return {"scenario": name, "ticks": args.ticks, "identical": not mismatched, "mismatched_planes": mismatched}
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Headless Particle Playground benchmark")
+    parser.add_argument("--scenario", action="append", dest="scenarios", choices=list(SCENARIOS),
+                        help="scenario to run, may be repeated (default: all)")
+    parser.add_argument("--ticks", type=int, default=600)
+    parser.add_argument("--width", type=int, default=480)
+    parser.add_argument("--height", type=int, default=270)
+    parser.add_argument("--cell-size", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--heat-interval", type=int, default=2, help="ticks per heat pass (the default tick and heat rates give 2)")
+    parser.add_argument("--backend", choices=BACKENDS, default="auto")
+    parser.add_argument("--verify-backends", action="store_true",
+                        help="check the Numba kernels match the NumPy ones instead of timing (needs numba)")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.scenarios:
+        args.scenarios = list(SCENARIOS)
+    results = []
+    if args.verify_backends:
+        for name in args.scenarios:
+            logger.info(f"Verifying kernel backends on scenario: {name}")
+            results.append(verify_scenario(name, args))
+    else:
+        pygame.display.init()
+        try:
+            for name in args.scenarios:
+                logger.info(f"Running benchmark scenario: {name}")
+                results.append(run_scenario(name, args))
+        finally:
+            pygame.quit()
+
+    report = json.dumps({"results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+        logger.info(f"Benchmark report written to {args.output}")
+    else:
+        print(report)
+    if not all(result.get("identical", True) for result in results):
+        logger.error("Kernel backends produced different grids")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# ./src/brush.py
+import numpy as np
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+class Brush:
+    def __init__(self, simulation):
+        self.simulation = simulation
+
+    def to_grid(self, points, screen_size):
+        grid = self.simulation.grid
+        scale_x = grid.width / max(1, screen_size[0])
+        scale_y = grid.height / max(1, screen_size[1])
+        return np.asarray(points, dtype=np.float64) * (scale_x, scale_y), scale_x, scale_y
+
+    def paint_stroke(self, points, radius, material, screen_size, blocked_mask=None):
+        # points are screen positions; each consecutive pair is painted as a
+        # capsule (a circle swept along the segment) so fast moves leave no gaps
+        if not points:
+            return
+        grid_points, scale_x, scale_y = self.to_grid(points, screen_size)
+        grid_radius = max(0.5, radius * scale_x)
+        keep = np.ones(len(grid_points), dtype=bool)
+        keep[1:] = np.any(np.floor(grid_points[1:]) != np.floor(grid_points[:-1]), axis=1)
+        grid_points = grid_points[keep]
+        if len(grid_points) == 1:
+            grid_points = np.vstack((grid_points, grid_points))
+        for start, end in zip(grid_points[:-1], grid_points[1:]):
+            self.paint_segment(start, end, grid_radius, material, scale_x, scale_y, blocked_mask)
+
+    def paint_segment(self, start, end, radius, material, scale_x, scale_y, blocked_mask):
+        grid = self.simulation.grid
+        left = max(0, int(np.floor(min(start[0], end[0]) - radius)))
+        right = min(grid.width, int(np.ceil(max(start[0], end[0]) + radius)) + 1)
+        top = max(0, int(np.floor(min(start[1], end[1]) - radius)))
+        bottom = min(grid.height, int(np.ceil(max(start[1], end[1]) + radius)) + 1)
+        if left >= right or top >= bottom:
+            return
+        xs = np.arange(left, right, dtype=np.float64)[None, :] + 0.5
+        ys = np.arange(top, bottom, dtype=np.float64)[:, None] + 0.5
+        dx, dy = end[0] - start[0], end[1] - start[1]
+        length_squared = dx * dx + dy * dy
+        if length_squared > 0:
+            t = np.clip(((xs - start[0]) * dx + (ys - start[1]) * dy) / length_squared, 0.0, 1.0)
+        else:
+            t = 0.0
+        distance_x = xs - (start[0] + t * dx)
+        distance_y = ys - (start[1] + t * dy)
+        mask = distance_x * distance_x + distance_y * distance_y <= radius * radius
+        if blocked_mask is not None and mask.any():
+            # Barriers are in screen pixels, so test each cell's centre there
+            screen_xs = np.broadcast_to((xs / scale_x).astype(np.int64), mask.shape)
+            screen_ys = np.broadcast_to((ys / scale_y).astype(np.int64), mask.shape)
+            mask &= ~blocked_mask(screen_xs, screen_ys)
+        self.simulation.paint_mask(left, top, mask, material)
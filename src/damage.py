@@ -0,0 +1,65 @@
+# ./src/damage.py
+import pygame
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Above this fraction of the window, one flip is cheaper than many small updates
+FULL_UPDATE_COVERAGE = 0.5
+
+def coalesce(rects):
+    # Merge rects whose union wastes no area over drawing them separately,
+    # which joins touching chunk runs and overlapping overlays
+    merged = []
+    for rect in sorted(rects, key=lambda rect: (rect.y, rect.x)):
+        for i, other in enumerate(merged):
+            union = other.union(rect)
+            if union.w * union.h <= other.w * other.h + rect.w * rect.h:
+                merged[i] = union
+                break
+        else:
+            merged.append(rect)
+    return merged
+
+class DamageTracker:
+    def __init__(self, coverage=FULL_UPDATE_COVERAGE):
+        self.coverage = coverage
+        self.size = None
+        self.full = True
+        self.rects = []
+        self.overlay_rects = []
+        self.updated_area = 0
+
+    def invalidate(self):
+        self.full = True
+
+    def begin_frame(self, size, world_rects):
+        # Returns the screen rects the world has to be redrawn into, or None
+        # when the whole window needs it: wherever the world changed, plus
+        # wherever overlays were drawn last frame, so they don't smear
+        if size != self.size:
+            self.size = size
+            self.full = True
+        if not self.full:
+            rects = world_rects + self.overlay_rects
+            if sum(rect.w * rect.h for rect in rects) > self.coverage * size[0] * size[1]:
+                self.full = True
+            else:
+                self.rects = coalesce(rects)
+        return None if self.full else self.rects
+
+    def end_frame(self, overlay_rects):
+        screen_rect = pygame.Rect((0, 0), self.size)
+        overlay_rects = [rect.clip(screen_rect) for rect in overlay_rects if rect]
+        overlay_rects = [rect for rect in overlay_rects if rect.w and rect.h]
+        if self.full:
+            pygame.display.flip()
+            self.updated_area = self.size[0] * self.size[1]
+            self.full = False
+        else:
+            rects = coalesce(self.rects + overlay_rects)
+            if rects:
+                pygame.display.update(rects)
+            self.updated_area = sum(rect.w * rect.h for rect in rects)
+        self.rects = []
+        self.overlay_rects = overlay_rects
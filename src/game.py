@@ -1,17 +1,48 @@
+import argparse
 import pygame
+import multiprocessing
 import sys
 import os
+import shutil
+import tempfile
 from src.input_handler import InputHandler
 from src.menu.main import MainMenu
 from src.storage import storage
 from src.logger import get_logger
 from src.palette import initialize_palette
+from appdirs import user_data_dir
+from src.simulation import Simulation, EMPTY, LOAD_ERRORS, material_id, save_world, WorldFile, WorldLoader
+from src.simulation.backend import load_backend
+from src.simulation.background import BackgroundSimulation
+from src.renderer import Renderer
+from src.damage import DamageTracker
+from src.brush import Brush
+from src.timestep import FixedTimestep
+from src.profiler import FrameProfiler
+from src.replay import ReplayRecorder, ReplayReader
 
 logger = get_logger(__name__)
 
-def main():
+WORLD_SAVE_PATH = os.path.join(user_data_dir("ParticlePlayground"), "worlds", "quicksave.ppw")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Particle Playground")
+    parser.add_argument("--record", metavar="PATH", help="record the input events of this session to a replay file")
+    parser.add_argument("--replay", metavar="PATH", help="replay a recorded session headlessly, as fast as possible")
+    parser.add_argument("--trace", metavar="PATH", help="write a Chrome trace of the session's frames on exit")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
     logger.info("Game starting")
 
+    replay = None
+    if args.replay:
+        replay = ReplayReader(args.replay)
+        # Replays run without a window and must not touch the user's settings
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        storage.persist = False
+
     # Check if we're running in a PyInstaller bundle
     if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
         is_development = False
@@ -35,75 +66,290 @@ def main():
     except ValueError:
         logger.error("Invalid window dimensions in settings. Using defaults.")
         width, height = 800, 600
+    if replay is not None:
+        width, height = replay.metadata["window"]
 
-    logger.info(f"Setting up display: {width}x{height}")
-    screen = pygame.display.set_mode((width, height), pygame.RESIZABLE)
+    vsync = bool(storage.get_setting("graphics", "vsync", default=False)) and replay is None
+    logger.info(f"Setting up display: {width}x{height}, vsync {'on' if vsync else 'off'}")
+    try:
+        screen = pygame.display.set_mode((width, height), pygame.RESIZABLE, vsync=int(vsync))
+    except pygame.error as e:
+        logger.warning(f"Could not enable vsync ({e}). Falling back to an uncapped display.")
+        screen = pygame.display.set_mode((width, height), pygame.RESIZABLE)
     pygame.display.set_caption("Particle Playground")
 
-    # Create input handler, menu, and palette
-    input_handler = InputHandler()
+    # Create profiler, input handler, menu, and palette
+    profiler = FrameProfiler()
+    input_handler = InputHandler(profiler)
     main_menu = MainMenu()
     current_menu = main_menu
     palette = initialize_palette()
 
-    # Set up the clock for a consistent frame rate
+    # Create the simulation, one grid cell per cell_size x cell_size block of pixels
+    cell_size = max(1, int(storage.get_setting("simulation", "cell_size", default=4)))
+    workers = max(0, int(storage.get_setting("simulation", "workers", default=0)))
+    # Heat diffuses at heat_rate passes per second, a sub-rate of the movement ticks
+    tick_rate = int(storage.get_setting("simulation", "tick_rate", default=60))
+    heat_rate = max(1, int(storage.get_setting("simulation", "heat_rate", default=30)))
+    heat_interval = max(1, round(tick_rate / heat_rate))
+    seed = None
+    if replay is not None:
+        # Start from exactly the state the recording started from
+        cell_size = replay.metadata["cell_size"]
+        seed = replay.metadata["seed"]
+        heat_interval = replay.metadata.get("heat_interval", heat_interval)
+        input_handler.cursor_size = replay.metadata["cursor_size"]
+        input_handler.max_cursor_size = replay.metadata["max_cursor_size"]
+        palette.selected_particle = replay.metadata["selected_particle"]
+        palette.selected_item = next((item for item in palette.items if item.id == replay.metadata["selected_group"]), None)
+    undo_memory = storage.handle("simulation", "undo_memory_mb", default=64, type=int)
+    undo_budget = undo_memory.value * 1024 * 1024
+    if replay is not None:
+        # Undo steps evicted while recording must be gone on playback too
+        undo_budget = replay.metadata.get("undo_budget", undo_budget)
+    max_catch_up_ticks = int(storage.get_setting("simulation", "max_catch_up_ticks", default=5))
+    backend = str(storage.get_setting("simulation", "backend", default="auto"))
+    # The background process ticks on its own clock, which recordings can't
+    # capture, so recording and replaying always simulate in this process
+    background = bool(storage.get_setting("simulation", "background", default=False)) and replay is None and not args.record
+    if background:
+        simulation = BackgroundSimulation(width // cell_size, height // cell_size, seed=seed, workers=workers,
+                                          heat_interval=heat_interval, backend=backend, undo_budget=undo_budget,
+                                          tick_rate=tick_rate, max_catch_up_ticks=max_catch_up_ticks)
+    else:
+        # The kernel backends are bit-identical, so replays don't depend on which one runs
+        simulation = Simulation(width // cell_size, height // cell_size, seed=seed, workers=workers,
+                                heat_interval=heat_interval, backend=load_backend(backend),
+                                undo_budget=undo_budget)
+    if replay is None:
+        undo_memory.subscribe(lambda megabytes: simulation.set_undo_budget(megabytes * 1024 * 1024))
+    renderer = Renderer(simulation.grid.width, simulation.grid.height)
+    damage = DamageTracker()
+    brush = Brush(simulation)
+    world_loader = None
+    # A replay quicksaves to and loads from a copy, so replaying F5 never
+    # overwrites the user's own quicksave
+    world_save_path = WORLD_SAVE_PATH
+    replay_worlds = None
+    if replay is not None:
+        replay_worlds = tempfile.TemporaryDirectory()
+        world_save_path = os.path.join(replay_worlds.name, os.path.basename(WORLD_SAVE_PATH))
+        if os.path.exists(WORLD_SAVE_PATH):
+            shutil.copyfile(WORLD_SAVE_PATH, world_save_path)
+
+    # The simulation runs on a fixed timestep, independent of the frame rate.
+    # fps_limit caps rendering only; 0 leaves it uncapped (or paced by vsync).
+    timestep = FixedTimestep(tick_rate, max_catch_up_ticks)
+    fps_limit = max(0, int(storage.get_setting("graphics", "fps_limit", default=60)))
     clock = pygame.time.Clock()
 
+    recorder = None
+    if replay is not None:
+        fps_limit = 0
+    elif args.record:
+        recorder = ReplayRecorder(args.record, {
+            "seed": simulation.seed,
+            "window": [width, height],
+            "cell_size": cell_size,
+            "cursor_size": input_handler.get_cursor_size(),
+            "max_cursor_size": input_handler.max_cursor_size,
+            "selected_particle": palette.get_selected_particle(),
+            "selected_group": palette.selected_item.id if palette.selected_item else None,
+            "tick_rate": timestep.tick_rate,
+            "heat_interval": simulation.heat_interval,
+            "undo_budget": undo_budget,
+        })
+
+    # Everything the game loop reacts to goes through the input handler's
+    # table, next to the handler's own cursor, key and stroke handling
+    def on_quit(event):
+        nonlocal running
+        logger.info("Quit event received")
+        running = False
+
+    def on_resize(event):
+        nonlocal screen
+        width, height = event.size
+        if replay is not None:
+            screen = pygame.display.set_mode((width, height), pygame.RESIZABLE)
+        storage.set_setting(width, "window", "width")
+        storage.set_setting(height, "window", "height")
+        simulation.resize(max(1, width // cell_size), max(1, height // cell_size))
+        renderer.resize(simulation.grid.width, simulation.grid.height)
+        logger.info(f"Window resized to {width}x{height}")
+
+    def on_exposed(event):
+        # The window system lost what was on screen, so repaint it all
+        damage.invalidate()
+
+    def on_focus_gained(event):
+        # Pick up icon art edited while the game was in the background
+        palette.refresh_icons()
+
+    def on_menu_event(event):
+        nonlocal running, current_menu
+        if not input_handler.is_menu_open():
+            return
+        result = current_menu.handle_event(event)
+        if isinstance(result, str):
+            if result == "MainMenu":
+                current_menu = main_menu
+            elif result == "Back to Game":
+                input_handler.show_menu = False
+            elif result == "Quit Game":
+                running = False
+        elif result != current_menu:
+            current_menu = result
+
+    def on_mouse_button_down(event):
+        if input_handler.is_menu_open():
+            on_menu_event(event)
+        elif event.button == 1:
+            # A press on the palette selects; anywhere else starts a stroke
+            if palette.check_click(event.pos) is None and not palette.is_blocked(event.pos):
+                input_handler.begin_stroke(event.pos)
+
+    input_handler.on(pygame.QUIT, on_quit)
+    input_handler.on(pygame.VIDEORESIZE, on_resize)
+    input_handler.on(pygame.WINDOWEXPOSED, on_exposed)
+    input_handler.on(pygame.WINDOWFOCUSGAINED, on_focus_gained)
+    input_handler.on(pygame.KEYDOWN, on_menu_event)
+    input_handler.on(pygame.MOUSEBUTTONDOWN, on_mouse_button_down)
+    input_handler.install_event_filter()
+
     # Main game loop
     running = True
     try:
         logger.info("Entering main game loop")
         while running:
-            # Handle events
-            events = pygame.event.get()
-            for event in events:
-                if event.type == pygame.QUIT:
-                    logger.info("Quit event received")
-                    running = False
-                elif event.type == pygame.VIDEORESIZE:
-                    width, height = event.size
-                    storage.set_setting(width, "window", "width")
-                    storage.set_setting(height, "window", "height")
-                    logger.info(f"Window resized to {width}x{height}")
-                if input_handler.is_menu_open():
-                    result = current_menu.handle_event(event)
-                    if isinstance(result, str):
-                        if result == "MainMenu":
-                            current_menu = main_menu
-                        elif result == "Back to Game":
-                            input_handler.show_menu = False
-                        elif result == "Quit Game":
-                            running = False
-                    elif result != current_menu:
-                        current_menu = result
-                else:
-                    if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                        palette.check_click(event.pos)
+            profiler.begin_frame()
 
-            # Handle input
+            # Handle events, either live or from the replay being played back
+            if replay is not None:
+                frame = replay.next_frame()
+                if frame is None:
+                    logger.info(f"Replay finished after {replay.frame + 1} frames")
+                    break
+                events, replay_ticks, replay_chunks = frame
+            else:
+                events = pygame.event.get()
+            # Handle input, each event going through the handler table once
             input_handler.handle_events(events, main_menu)
+            profiler.lap("events")
+
+            # Quick save and load of the world, and undo/redo of brush strokes
+            for command in input_handler.take_commands():
+                if command == "save_world":
+                    if background:
+                        simulation.save_world(world_save_path)
+                    else:
+                        save_world(world_save_path, simulation.grid)
+                elif command == "load_world":
+                    if os.path.exists(world_save_path):
+                        # A bad quicksave is reported and the current world kept
+                        try:
+                            if background:
+                                simulation.load_world(world_save_path)
+                            else:
+                                world_file = WorldFile(world_save_path)
+                                if world_loader is not None:
+                                    world_loader.close()
+                                world_loader = WorldLoader(world_file, simulation)
+                            renderer.resize(simulation.grid.width, simulation.grid.height)
+                        except LOAD_ERRORS as e:
+                            logger.warning(f"Could not load world {world_save_path}: {e}")
+                    else:
+                        logger.warning(f"No saved world at {world_save_path}")
+                elif command == "undo":
+                    simulation.undo()
+                elif command == "redo":
+                    simulation.redo()
+
+            # A loading world streams in a few chunks per frame, and the
+            # simulation waits until it is all there. A replay reads as many
+            # chunks each frame as the recording did, so strokes painted while
+            # loading land on the same half-loaded world.
+            loaded_chunks = 0
+            if world_loader is not None:
+                read = world_loader.read
+                if replay is not None:
+                    loaded = world_loader.load(budget=float("inf"), limit=replay_chunks)
+                else:
+                    loaded = world_loader.load()
+                loaded_chunks = world_loader.read - read
+                if loaded:
+                    world_loader = None
+
+            # Paint the selected particle along the strokes since the last frame
+            for i, stroke_points in enumerate(input_handler.take_strokes()):
+                if i:
+                    # The stroke before this one was released during the frame
+                    simulation.end_edit()
+                if input_handler.is_menu_open():
+                    continue
+                material = material_id(palette.get_selected_particle())
+                if material != EMPTY:
+                    # The whole stroke, press to release, is one undo step
+                    simulation.begin_edit()
+                    brush.paint_stroke(stroke_points, input_handler.get_cursor_size(), material,
+                                       screen.get_size(), palette.blocked_mask)
+            if not input_handler.stroking:
+                simulation.end_edit()
 
-            # Fill the screen with black
-            screen.fill((0, 0, 0))
+            # Advance the simulation by however many fixed ticks are due. Under
+            # load several ticks run per frame, so frames drop but physics keeps pace.
+            # A background simulation ticks by itself; the frame only passes it
+            # this frame's edits and picks up its newest completed grid.
+            if background:
+                simulation.sync()
+            else:
+                ticks = timestep.advance() if replay is None else replay_ticks
+                if world_loader is not None:
+                    ticks = 0
+                for _ in range(ticks):
+                    simulation.step()
+                if recorder is not None:
+                    recorder.record_frame(events, ticks, loaded_chunks)
+            profiler.lap("simulation")
+
+            # Draw the world, which covers the whole window and so replaces
+            # screen.fill. Only the chunks that changed and the areas last
+            # frame's overlays covered are redrawn; the rest is still on screen.
+            size = screen.get_size()
+            world_rects = [renderer.cells_to_screen(rect, size) for rect in renderer.draw(simulation.grid, simulation.chunks)]
+            renderer.present(screen, damage.begin_frame(size, world_rects))
+            profiler.lap("world")
 
             # Draw the cursor
-            input_handler.draw_cursor(screen)
+            overlay_rects = [input_handler.draw_cursor(screen)]
 
             # Draw the menu if it's open
             if input_handler.is_menu_open():
-                current_menu.draw(screen)
+                overlay_rects.append(current_menu.draw(screen))
             else:
                 palette.check_hover(pygame.mouse.get_pos())  # Check hover status
-                palette.draw(screen)
+                overlay_rects.extend(palette.draw(screen))
 
             # Update the invisible barriers
             palette.update_invisible_barriers(screen)
+            profiler.lap("menu" if input_handler.is_menu_open() else "palette")
+
+            # Draw the diagnostics overlay, counting only while it is visible
+            if profiler.visible:
+                profiler.set_counter("particles", simulation.count_particles())
+                profiler.set_counter("awake chunks", simulation.count_awake_chunks())
+                profiler.set_counter("updated area", damage.updated_area * 100 // max(1, size[0] * size[1]), "%")
+                overlay_rects.append(profiler.draw(screen))
+                profiler.lap("overlay")
 
-            # Update the display
-            pygame.display.flip()
+            # Update the display, only where something was drawn
+            damage.end_frame(overlay_rects)
+            profiler.lap("flip")
 
-            # Cap the frame rate
-            clock.tick(60)
+            # Cap the frame rate, if configured
+            clock.tick(fps_limit)
+            profiler.lap("idle")
+            profiler.end_frame()
             logger.trace(f"FPS: {clock.get_fps():.2f}")
 
     except KeyboardInterrupt:
@@ -118,7 +364,15 @@ def main():
         storage.set_setting(current_size[1], "window", "height")
         storage.set_setting(input_handler.get_cursor_size(), "cursor", "size")
         storage.set_setting(input_handler.max_cursor_size, "cursor", "max_size")
-        storage.save_settings()
+        storage.flush()
+        simulation.close()
+        if recorder is not None:
+            recorder.close()
+        if replay is not None:
+            replay.close()
+            replay_worlds.cleanup()
+        if args.trace:
+            profiler.export_chrome_trace(args.trace)
         # Quit Pygame
         pygame.quit()
         if is_development:
@@ -127,4 +381,5 @@ def main():
         sys.exit()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
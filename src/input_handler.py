@@ -4,38 +4,123 @@ from src.logger import get_logger
 
 logger = get_logger(__name__)
 
+ALLOWED_EVENTS = [
+    pygame.QUIT,
+    pygame.VIDEORESIZE,
+    pygame.WINDOWEXPOSED,
+    pygame.WINDOWFOCUSGAINED,
+    pygame.MOUSEMOTION,
+    pygame.MOUSEBUTTONDOWN,
+    pygame.MOUSEBUTTONUP,
+    pygame.MOUSEWHEEL,
+    pygame.KEYDOWN,
+]
+
 class InputHandler:
-    def __init__(self):
-        self.cursor_size = storage.get_setting("cursor", "size", default=5)
-        self.max_cursor_size = storage.get_setting("cursor", "max_size", default=50)
+    def __init__(self, profiler=None):
+        self.cursor_size_setting = storage.handle("cursor", "size", default=5, type=int)
+        self.max_cursor_size_setting = storage.handle("cursor", "max_size", default=50, type=int)
+        self.cursor_size = self.cursor_size_setting.value
+        self.max_cursor_size = self.max_cursor_size_setting.value
+        self.cursor_size_setting.subscribe(self.set_cursor_size)
+        self.max_cursor_size_setting.subscribe(self.set_max_cursor_size)
         self.cursor_color = pygame.Color('white')
         self.cursor_pos = pygame.mouse.get_pos()
         self.show_menu = False
+        self.stroking = False
+        self.stroke_points = []
+        self.finished_strokes = []
+        self.commands = []
+        self.profiler = profiler
+        self.menu = None
+        self.handlers = {}
+        self.on(pygame.KEYDOWN, self.on_key_down)
+        self.on(pygame.MOUSEBUTTONUP, self.on_mouse_button_up)
         logger.info(f"InputHandler initialized. Cursor size: {self.cursor_size}, Max size: {self.max_cursor_size}")
 
+    def on(self, event_type, callback):
+        self.handlers.setdefault(event_type, []).append(callback)
+
+    @staticmethod
+    def install_event_filter():
+        # Events nothing listens to never make it into the queue
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed(ALLOWED_EVENTS)
+
     def handle_events(self, events, menu):
+        # Every event is dispatched exactly once. Mouse motion is the hot path,
+        # with high polling rate mice sending hundreds per frame, so it only
+        # extends this frame's polyline; wheel ticks are summed and applied once.
+        self.menu = menu
+        scroll = 0
         for event in events:
-            if event.type == pygame.MOUSEMOTION:
+            event_type = event.type
+            if event_type == pygame.MOUSEMOTION:
                 self.cursor_pos = event.pos
-                logger.trace(f"Mouse moved to {self.cursor_pos}")
-            elif event.type == pygame.MOUSEWHEEL:
-                self.adjust_cursor_size(event.y)
-                logger.trace(f"Mouse wheel scrolled: {event.y}")
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    self.show_menu = not self.show_menu
-                    logger.debug(f"Menu toggled: {'shown' if self.show_menu else 'hidden'}")
-                elif event.key == pygame.K_TAB and self.show_menu:
-                    menu.next_option()
-                    logger.trace("Menu option changed")
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                if event.button == 1 and self.show_menu:  # Left mouse button
-                    menu.check_click(event.pos)
-                    logger.trace(f"Menu clicked at {event.pos}")
-            elif event.type == pygame.VIDEORESIZE:
-                logger.info(f"Window resized to {event.w}x{event.h}")
-                storage.set_setting(event.w, "window", "width")
-                storage.set_setting(event.h, "window", "height")
+                if self.stroking:
+                    self.stroke_points.append(event.pos)
+            elif event_type == pygame.MOUSEWHEEL:
+                scroll += event.y
+            else:
+                for callback in self.handlers.get(event_type, ()):
+                    callback(event)
+        if scroll:
+            self.adjust_cursor_size(scroll)
+
+    def on_key_down(self, event):
+        if event.key == pygame.K_ESCAPE:
+            self.show_menu = not self.show_menu
+            logger.debug(f"Menu toggled: {'shown' if self.show_menu else 'hidden'}")
+        elif event.key == pygame.K_TAB and self.show_menu:
+            self.menu.next_option()
+            logger.trace("Menu option changed")
+        elif event.key == pygame.K_F3 and self.profiler is not None:
+            self.profiler.toggle()
+        elif event.key == pygame.K_F4 and self.profiler is not None:
+            self.profiler.export_chrome_trace()
+        elif event.key == pygame.K_F5:
+            self.commands.append("save_world")
+        elif event.key == pygame.K_F9:
+            self.commands.append("load_world")
+        elif event.key == pygame.K_z and event.mod & pygame.KMOD_CTRL:
+            self.commands.append("redo" if event.mod & pygame.KMOD_SHIFT else "undo")
+        elif event.key == pygame.K_y and event.mod & pygame.KMOD_CTRL:
+            self.commands.append("redo")
+
+    def on_mouse_button_up(self, event):
+        if event.button == 1:
+            self.end_stroke()
+
+    def begin_stroke(self, pos):
+        # A stroke released earlier in the frame is kept whole for painting
+        if self.stroke_points:
+            self.finished_strokes.append(self.stroke_points)
+        self.stroking = True
+        self.stroke_points = [pos]
+
+    def end_stroke(self):
+        self.stroking = False
+
+    def take_strokes(self):
+        # Every position the mouse passed through since the last call, one
+        # list per stroke. While the button is held the last point is kept,
+        # so the next frame's stroke joins up with this one (and a still
+        # mouse keeps pouring).
+        strokes, self.finished_strokes = self.finished_strokes, []
+        points = self.stroke_points
+        if self.stroking:
+            if not points:
+                points = [self.cursor_pos]
+            self.stroke_points = [points[-1]]
+        else:
+            self.stroke_points = []
+        if points:
+            strokes.append(points)
+        return strokes
+
+    def take_commands(self):
+        commands, self.commands = self.commands, []
+        return commands
 
     def adjust_cursor_size(self, scroll_amount):
         new_size = max(1, min(self.max_cursor_size, self.cursor_size + scroll_amount))
@@ -44,8 +129,15 @@ class InputHandler:
             storage.set_setting(self.cursor_size, "cursor", "size")
             logger.debug(f"Cursor size adjusted to {self.cursor_size}")
 
+    def set_cursor_size(self, cursor_size):
+        self.cursor_size = max(1, min(self.max_cursor_size, cursor_size))
+
+    def set_max_cursor_size(self, max_cursor_size):
+        self.max_cursor_size = max(1, max_cursor_size)
+        self.cursor_size = min(self.cursor_size, self.max_cursor_size)
+
     def draw_cursor(self, screen):
-        pygame.draw.circle(screen, self.cursor_color, self.cursor_pos, self.cursor_size, 1)
+        return pygame.draw.circle(screen, self.cursor_color, self.cursor_pos, self.cursor_size, 1)
 
     def get_cursor_size(self):
         return self.cursor_size
@@ -2,30 +2,43 @@ import pygame
 from src.storage import storage
 from src.logger import get_logger
 from src.menu.settings import SettingsMenu
+from src.utils.text import text_cache
 
 logger = get_logger(__name__)
 
+MENU_POSITION = (250, 200)
+MENU_SIZE = (300, 200)
+
 class MainMenu:
     def __init__(self):
         self.font = pygame.font.Font(None, 36)
         self.options = ["Back to Game", "Settings", "Quit Game"]
         self.selected = 0
         self.option_rects = []
+        self.surface = None
+        self.rendered_selected = None
         self.settings_menu = SettingsMenu()
         logger.info("Main menu initialized")
 
     def draw(self, screen):
-        menu_surface = pygame.Surface((300, 200))
-        menu_surface.fill((50, 50, 50))
+        # The menu only changes when the selection does, so it's rendered
+        # once per change and blitted as a single surface otherwise
+        if self.surface is None or self.rendered_selected != self.selected:
+            self.render()
+        return screen.blit(self.surface, MENU_POSITION)
+
+    def render(self):
+        self.surface = pygame.Surface(MENU_SIZE)
+        self.surface.fill((50, 50, 50))
         self.option_rects = []
         for i, option in enumerate(self.options):
             color = (255, 255, 0) if i == self.selected else (255, 255, 255)
-            text = self.font.render(option, True, color)
+            text = text_cache.render(self.font, option, color)
             text_rect = text.get_rect(topleft=(20, 20 + i * 40))
-            menu_surface.blit(text, text_rect)
-            self.option_rects.append(text_rect.move(250, 200))
-        screen.blit(menu_surface, (250, 200))
-        logger.debug("Menu drawn")
+            self.surface.blit(text, text_rect)
+            self.option_rects.append(text_rect.move(MENU_POSITION))
+        self.rendered_selected = self.selected
+        logger.debug("Menu rendered")
 
     def next_option(self):
         self.selected = (self.selected + 1) % len(self.options)
@@ -1,6 +1,7 @@
 import pygame
 from src.storage import storage
 from src.logger import get_logger
+from src.utils.text import text_cache
 
 logger = get_logger(__name__)
 
@@ -8,57 +9,88 @@ class SettingsMenu:
     def __init__(self):
         self.font = pygame.font.Font(None, 24)
         self.title_font = pygame.font.Font(None, 36)
-        self.settings = {
+        self.setting_handles = {
             "Cursor": {
-                "Size": storage.get_setting("cursor", "size", default=5),
-                "Max Size": storage.get_setting("cursor", "max_size", default=100)
+                "Size": storage.handle("cursor", "size", default=5, type=int),
+                "Max Size": storage.handle("cursor", "max_size", default=50, type=int)
             },
             "Window": {
-                "Width": storage.get_setting("window", "width", default=800),
-                "Height": storage.get_setting("window", "height", default=600)
+                "Width": storage.handle("window", "width", default=800, type=int),
+                "Height": storage.handle("window", "height", default=600, type=int)
             },
             "Palette": {
-                "Icon Size": storage.get_setting("graphics", "palette", "icon_size", default=24)  # Updated default to 24
+                "Icon Size": storage.handle("graphics", "palette", "icon_size", default=32, type=int)
             }
         }
+        self.settings = {}
+        for category, handles in self.setting_handles.items():
+            self.settings[category] = {}
+            for setting, handle in handles.items():
+                self.settings[category][setting] = handle.value
+                handle.subscribe(lambda value, category=category, setting=setting: self.refresh_setting(category, setting, value))
         self.active_setting = None
         self.buttons = []
         self.text_cursor_pos = 0
         self.text_cursor_visible = True
         self.text_cursor_blink_time = 0
+        self.surface = None
+        self.rendered_state = None
 
     def draw(self, screen):
-        screen.fill((30, 30, 30))
+        # Blink the text cursor; done here since only clicks and key presses
+        # reach handle_event
+        current_time = pygame.time.get_ticks()
+        if current_time - self.text_cursor_blink_time > 500:
+            self.text_cursor_visible = not self.text_cursor_visible
+            self.text_cursor_blink_time = current_time
+
+        # Re-render only when something on the page changed: a value, the
+        # field being edited, the text cursor or the window size
+        state = self.render_state(screen.get_size())
+        if self.surface is None or state != self.rendered_state:
+            self.render(screen.get_size())
+            self.rendered_state = state
+        return screen.blit(self.surface, (0, 0))
+
+    def render_state(self, size):
+        values = tuple((category, setting, value) for category, items in self.settings.items() for setting, value in items.items())
+        cursor = (self.text_cursor_pos, self.text_cursor_visible) if self.active_setting else None
+        return size, values, self.active_setting, cursor
+
+    def render(self, size):
+        self.surface = pygame.Surface(size)
+        surface = self.surface
+        surface.fill((30, 30, 30))
         y = 20
         self.buttons = []  # Reset buttons list
         for category, items in self.settings.items():
-            category_text = self.title_font.render(category, True, (255, 255, 255))
-            screen.blit(category_text, (20, y))
+            category_text = text_cache.render(self.title_font, category, (255, 255, 255))
+            surface.blit(category_text, (20, y))
             y += 40
             for setting, value in items.items():
-                setting_text = self.font.render(f"{setting}:", True, (200, 200, 200))
-                screen.blit(setting_text, (40, y))
+                setting_text = text_cache.render(self.font, f"{setting}:", (200, 200, 200))
+                surface.blit(setting_text, (40, y))
                 input_rect = pygame.Rect(200, y, 100, 30)
-                pygame.draw.rect(screen, (100, 100, 100), input_rect)
-                value_text = self.font.render(str(value), True, (255, 255, 255))
-                screen.blit(value_text, (210, y + 5))
+                pygame.draw.rect(surface, (100, 100, 100), input_rect)
+                value_text = text_cache.render(self.font, str(value), (255, 255, 255))
+                surface.blit(value_text, (210, y + 5))
                 if self.active_setting == setting:
                     if self.text_cursor_visible:
                         cursor_x = 210 + self.font.size(str(value)[:self.text_cursor_pos])[0]
-                        pygame.draw.line(screen, (255, 255, 255), (cursor_x, y + 5), (cursor_x, y + 25), 2)
+                        pygame.draw.line(surface, (255, 255, 255), (cursor_x, y + 5), (cursor_x, y + 25), 2)
                 self.buttons.append((setting, input_rect))
                 y += 40
             y += 20
 
         # Draw Save and Cancel buttons
-        save_button = pygame.Rect(screen.get_width() - 220, screen.get_height() - 50, 100, 40)
-        cancel_button = pygame.Rect(screen.get_width() - 110, screen.get_height() - 50, 100, 40)
-        pygame.draw.rect(screen, (0, 255, 0), save_button)
-        pygame.draw.rect(screen, (255, 0, 0), cancel_button)
-        save_text = self.font.render("Save", True, (0, 0, 0))
-        cancel_text = self.font.render("Cancel", True, (0, 0, 0))
-        screen.blit(save_text, (save_button.x + 30, save_button.y + 10))
-        screen.blit(cancel_text, (cancel_button.x + 20, cancel_button.y + 10))
+        save_button = pygame.Rect(surface.get_width() - 220, surface.get_height() - 50, 100, 40)
+        cancel_button = pygame.Rect(surface.get_width() - 110, surface.get_height() - 50, 100, 40)
+        pygame.draw.rect(surface, (0, 255, 0), save_button)
+        pygame.draw.rect(surface, (255, 0, 0), cancel_button)
+        save_text = text_cache.render(self.font, "Save", (0, 0, 0))
+        cancel_text = text_cache.render(self.font, "Cancel", (0, 0, 0))
+        surface.blit(save_text, (save_button.x + 30, save_button.y + 10))
+        surface.blit(cancel_text, (cancel_button.x + 20, cancel_button.y + 10))
         self.buttons.append(("Save", save_button))
         self.buttons.append(("Cancel", cancel_button))
 
@@ -89,12 +121,6 @@ class SettingsMenu:
             elif event.key == pygame.K_RETURN:
                 self.save_settings()
                 return "MainMenu"
-        
-        # Blink the text cursor
-        current_time = pygame.time.get_ticks()
-        if current_time - self.text_cursor_blink_time > 500:
-            self.text_cursor_visible = not self.text_cursor_visible
-            self.text_cursor_blink_time = current_time
 
         return self
 
@@ -113,6 +139,11 @@ class SettingsMenu:
                 except ValueError:
                     pass
 
+    def refresh_setting(self, category, setting, value):
+        # Don't clobber a value the user is in the middle of typing
+        if self.active_setting != setting:
+            self.settings[category][setting] = value
+
     def get_active_value(self):
         for category, items in self.settings.items():
             if self.active_setting in items:
@@ -120,10 +151,8 @@ class SettingsMenu:
         return None
 
     def save_settings(self):
-        storage.set_setting(self.settings["Cursor"]["Size"], "cursor", "size")
-        storage.set_setting(self.settings["Cursor"]["Max Size"], "cursor", "max_size")
-        storage.set_setting(self.settings["Window"]["Width"], "window", "width")
-        storage.set_setting(self.settings["Window"]["Height"], "window", "height")
-        storage.set_setting(self.settings["Palette"]["Icon Size"], "graphics", "palette", "icon_size")
+        for category, handles in self.setting_handles.items():
+            for setting, handle in handles.items():
+                storage.set_setting(self.settings[category][setting], *handle.keys)
         storage.save_settings()
         logger.info("Settings saved")
\ No newline at end of file
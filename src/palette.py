@@ -1,8 +1,13 @@
 # ./src/palette.py
+import os
 import pygame
 from src.storage import storage
 from src.logger import get_logger
-from src.utils.icon import save_icon, frameify_icon, get_icon
+from src.utils.icon import save_icon, frameify_icon, get_icon, pregenerate_icons, icon_cache
+from src.utils.atlas import IconAtlas
+from src.utils.spatial import RectIndex
+from src.utils.text import text_cache
+from src.simulation.materials import registry
 
 logger = get_logger(__name__)
 
@@ -13,15 +18,41 @@ class PaletteItem:
         self.icon_path = icon_path
         self.frame_path = frame_path
         self.icon = None
+        self.surface = None
+        self.source_mtimes = None
         self.subitems = []
-
-    def load_icon(self):
-        if self.icon is None:
-            cache_relative_path = f"icons/{self.id}.png"
-            self.icon = get_icon(self.icon_path, self.frame_path, cache_relative_path)
+        self.palette = None
+
+    def load_icon(self, icon_size):
+        # The icon cache is keyed by source content and size, so a changed
+        # asset or size simply resolves to a different cached file
+        if self.icon is None or self.icon.size != (icon_size, icon_size):
+            self.icon = get_icon(self.icon_path, self.frame_path, icon_size)
+            self.source_mtimes = self.get_source_mtimes()
+
+    def get_source_mtimes(self):
+        return tuple(os.path.getmtime(path) if os.path.exists(path) else None for path in (self.icon_path, self.frame_path))
+
+    def get_surface(self, icon_size):
+        # Built once per icon size; drawing is then a plain blit
+        if self.surface is None or self.surface.get_width() != icon_size:
+            self.load_icon(icon_size)
+            surface = pygame.image.fromstring(self.icon.tobytes(), self.icon.size, self.icon.mode)
+            self.surface = pygame.transform.scale(surface, (icon_size, icon_size)).convert_alpha()
+        return self.surface
+
+    def refresh_icon(self):
+        if self.source_mtimes is not None and self.get_source_mtimes() != self.source_mtimes:
+            logger.info(f"Icon assets for {self.id} changed, regenerating")
+            self.icon = None
+            self.surface = None
+            return True
+        return False
 
     def add_subitem(self, subitem):
         self.subitems.append(subitem)
+        if self.palette is not None:
+            self.palette.queue_atlas_update(subitem)
 
 class Palette:
     def __init__(self):
@@ -30,51 +61,122 @@ class Palette:
         self.selected_item = None
         self.hovered_item = None
         self.rects = []
-        self.icon_size = storage.get_setting("graphics", "palette", "icon_size", default=32)
+        self.icon_size_setting = storage.handle("graphics", "palette", "icon_size", default=32, type=int)
+        self.icon_size = self.icon_size_setting.value
+        self.icon_size_setting.subscribe(self.set_icon_size)
         self.selected_group = storage.get_setting("graphics", "palette", "palette_group_selected", default="powders")
+        self.selected_particle = storage.get_setting("selected_particle", default="dust")
         self.invisible_barriers = []
+        self.layout_key = None
+        self.hit_index = RectIndex((0, 0))
+        self.barrier_index = RectIndex((0, 0))
+        self.atlas = IconAtlas.load(self.icon_size)
+        self.atlas_pending = []
 
     def add_item(self, item):
         self.items.append(item)
         if item.id == self.selected_group:
             self.selected_item = item
+        self.queue_atlas_update(item)
+        for subitem in item.subitems:
+            self.queue_atlas_update(subitem)
+
+    def queue_atlas_update(self, item):
+        item.palette = self
+        self.atlas_pending.append(item)
+
+    def update_atlas(self):
+        # Only queued items are looked at; ones whose cached key still
+        # matches (e.g. loaded from the saved atlas) are not decoded at all
+        pending, self.atlas_pending = self.atlas_pending, []
+        stale = []
+        for item in pending:
+            key = icon_cache.key(item.icon_path, item.frame_path, self.icon_size)
+            item.source_mtimes = item.get_source_mtimes()
+            if not self.atlas.is_current(item.id, key):
+                stale.append((item, key))
+        if not stale:
+            return
+        pregenerate_icons([(item.icon_path, item.frame_path) for item, _ in stale], self.icon_size)
+        for item, key in stale:
+            self.atlas.add(item.id, item.get_surface(self.icon_size), key)
+            # The atlas holds the pixels now, so the per-item copies can go
+            item.icon = None
+            item.surface = None
+        self.atlas.save()
+
+    def update_layout(self, size):
+        # Geometry only depends on these, so it is rebuilt when one of them
+        # changes instead of every frame
+        subitem_count = len(self.selected_item.subitems) if self.selected_item else 0
+        layout_key = (size, self.icon_size, self.selected_item, len(self.items), subitem_count)
+        if layout_key == self.layout_key:
+            return
+        self.layout_key = layout_key
+        width, height = size
+        self.rects = []
 
-    def draw(self, screen):
-        x = screen.get_width() - self.icon_size - 20
+        x = width - self.icon_size - 20
         y = 20
-        self.rects = []
         for item in self.items:
-            item.load_icon()
-            item_rect = pygame.Rect(x, y, self.icon_size, self.icon_size)
-            self.rects.append((item_rect, item))
-            icon_surface = pygame.image.fromstring(item.icon.tobytes(), item.icon.size, item.icon.mode)
-            icon_surface = pygame.transform.scale(icon_surface, (self.icon_size, self.icon_size))
-            screen.blit(icon_surface, item_rect.topleft)
-            if item_rect.collidepoint(pygame.mouse.get_pos()):
-                self.hovered_item = item
-                self.draw_text(screen, item.name, item_rect.left - 10, item_rect.centery, align="right")
+            self.rects.append((pygame.Rect(x, y, self.icon_size, self.icon_size), item))
             y += self.icon_size + 10
         if self.selected_item:
-            self.draw_subitems(screen)
+            subitem_x = width - (2 * self.icon_size) - 30
+            subitem_y = height - self.icon_size - 10
+            for subitem in reversed(self.selected_item.subitems):
+                self.rects.append((pygame.Rect(subitem_x, subitem_y, self.icon_size, self.icon_size), subitem))
+                subitem_x -= self.icon_size + 10
 
-    def draw_subitems(self, screen):
-        if not self.selected_item:
-            return
-        subitem_x = screen.get_width() - (2 * self.icon_size) - 30
-        subitem_y = screen.get_height() - self.icon_size - 10
-        for subitem in reversed(self.selected_item.subitems):
-            subitem.load_icon()
-            subitem_rect = pygame.Rect(subitem_x, subitem_y, self.icon_size, self.icon_size)
-            self.rects.append((subitem_rect, subitem))
-            icon_surface = pygame.image.fromstring(subitem.icon.tobytes(), subitem.icon.size, subitem.icon.mode)
-            icon_surface = pygame.transform.scale(icon_surface, (self.icon_size, self.icon_size))
-            screen.blit(icon_surface, subitem_rect.topleft)
-            if subitem_rect.collidepoint(pygame.mouse.get_pos()):
-                self.draw_text(screen, subitem.name, subitem_rect.left + self.icon_size // 2, subitem_rect.top - 25, align="center")
-            subitem_x -= self.icon_size + 10
+        self.invisible_barriers = []
+
+        # Right palette barrier
+        right_palette_x = width - self.icon_size - 20
+        right_palette_y = 20
+        for item in self.items:
+            item_rect = pygame.Rect(right_palette_x, right_palette_y, self.icon_size, self.icon_size)
+            self.invisible_barriers.append(item_rect)
+            right_palette_y += self.icon_size + 10
+
+        # Bottom palette barrier, lined up with where the subitems are drawn
+        bottom_palette_x = width - (2 * self.icon_size) - 30
+        bottom_palette_y = height - self.icon_size - 10
+        left_margin = self.icon_size + 20  # Prevent overlap with the left palette
+        if self.selected_item:
+            for subitem in reversed(self.selected_item.subitems):
+                if bottom_palette_x < left_margin:
+                    break
+                subitem_rect = pygame.Rect(bottom_palette_x, bottom_palette_y, self.icon_size, self.icon_size)
+                self.invisible_barriers.append(subitem_rect)
+                bottom_palette_x -= self.icon_size + 10
+
+        self.hit_index = RectIndex(size)
+        for item_rect, item in self.rects:
+            self.hit_index.insert(item_rect, item)
+        self.barrier_index = RectIndex(size)
+        for barrier in self.invisible_barriers:
+            self.barrier_index.insert(barrier, barrier)
+        logger.debug(f"Palette layout rebuilt for {width}x{height}")
+
+    def draw(self, screen):
+        self.update_atlas()
+        self.update_layout(screen.get_size())
+        drawn = []
+        for item_rect, item in self.rects:
+            self.atlas.blit(screen, item.id, item_rect.topleft)
+            drawn.append(item_rect)
+        if self.hovered_item is not None:
+            for item_rect, item in self.rects:
+                if item is self.hovered_item:
+                    if item in self.items:
+                        drawn.append(self.draw_text(screen, item.name, item_rect.left - 10, item_rect.centery, align="right"))
+                    else:
+                        drawn.append(self.draw_text(screen, item.name, item_rect.left + self.icon_size // 2, item_rect.top - 25, align="center"))
+                    break
+        return drawn
 
     def draw_text(self, screen, text, x, y, align="left"):
-        text_surface = self.font.render(text, True, (255, 255, 255))
+        text_surface = text_cache.render(self.font, text, (255, 255, 255))
         text_rect = text_surface.get_rect()
         if align == "right":
             text_rect.topright = (x, y)
@@ -82,67 +184,70 @@ class Palette:
             text_rect.midtop = (x, y)
         else:
             text_rect.topleft = (x, y)
-        screen.blit(text_surface, text_rect)
+        return screen.blit(text_surface, text_rect)
 
     def check_hover(self, pos):
-        for item_rect, item in self.rects:
-            if item_rect.collidepoint(pos):
-                self.hovered_item = item
-                return item.id
-        self.hovered_item = None
-        return None
+        self.hovered_item = self.hit_index.query_point(pos)
+        return self.hovered_item.id if self.hovered_item is not None else None
 
     def check_click(self, pos):
-        for item_rect, item in self.rects:
-            if item_rect.collidepoint(pos):
-                if item in self.items:
-                    self.selected_item = item
-                    storage.set_setting(item.id, "graphics", "palette", "palette_group_selected")
-                logger.info(f"Selected particle: {item.name}")
-                return item.id
-        return None
+        item = self.hit_index.query_point(pos)
+        if item is None:
+            return None
+        if item in self.items:
+            self.selected_item = item
+            storage.set_setting(item.id, "graphics", "palette", "palette_group_selected")
+        else:
+            self.selected_particle = item.id
+            storage.set_setting(item.id, "selected_particle")
+        logger.info(f"Selected particle: {item.name}")
+        return item.id
+
+    def set_icon_size(self, icon_size):
+        self.icon_size = icon_size
+        self.atlas = IconAtlas.load(icon_size)
+        self.atlas_pending = list(self.all_items())
+        self.update_atlas()
+        logger.info(f"Palette icon size changed to {icon_size}")
+
+    def all_items(self):
+        for item in self.items:
+            yield item
+            yield from item.subitems
+
+    def refresh_icons(self):
+        for item in self.all_items():
+            if item.refresh_icon():
+                self.atlas_pending.append(item)
 
     def get_selected_item(self):
         return self.selected_item
 
-    def update_invisible_barriers(self, screen):
-        self.invisible_barriers = []
+    def get_selected_particle(self):
+        return self.selected_particle
 
-        # Right palette barrier
-        right_palette_x = screen.get_width() - self.icon_size - 20
-        right_palette_y = 20
-        for item in self.items:
-            item_rect = pygame.Rect(right_palette_x, right_palette_y, self.icon_size, self.icon_size)
-            self.invisible_barriers.append(item_rect)
-            right_palette_y += self.icon_size + 10
+    def is_blocked(self, pos):
+        return self.barrier_index.query_point(pos) is not None
 
-        # Bottom palette barrier
-        bottom_palette_x = screen.get_width() - self.icon_size - 20
-        bottom_palette_y = screen.get_height() - self.icon_size - 10
-        left_margin = self.icon_size + 20  # Prevent overlap with the left palette
-        if self.selected_item:
-            for subitem in reversed(self.selected_item.subitems):
-                if bottom_palette_x < left_margin:
-                    break
-                subitem_rect = pygame.Rect(bottom_palette_x, bottom_palette_y, self.icon_size, self.icon_size)
-                self.invisible_barriers.append(subitem_rect)
-                bottom_palette_x -= self.icon_size + 10
+    def blocked_mask(self, xs, ys):
+        # Vectorized is_blocked for whole brush footprints in screen pixels
+        return self.barrier_index.contains_points(xs, ys)
+
+    def update_invisible_barriers(self, screen):
+        self.update_layout(screen.get_size())
 
 # Example of adding items to the palette
 def initialize_palette():
     palette = Palette()
 
-    # Add main items
-    powders_icon_path = 'assets/palette/toplevel/powders.png'
-    powders_frame_path = 'assets/palette/toplevel/frame.png'
-    powders_item = PaletteItem("powders", "Powders", powders_icon_path, powders_frame_path)
-
-    # Add subitems
-    dust_icon_path = 'assets/palette/powders/dust.png'
-    dust_frame_path = 'assets/palette/toplevel/frame.png'
-    dust_item = PaletteItem("dust", "Dust", dust_icon_path, dust_frame_path)
-    powders_item.add_subitem(dust_item)
-
-    palette.add_item(powders_item)
+    # The palette tree mirrors the material definitions under assets/materials
+    for category in registry.categories:
+        category_item = PaletteItem(category.id, category.name, category.icon_path, category.frame_path)
+        for material in category.materials:
+            if material.icon_path is None:
+                continue
+            category_item.add_subitem(PaletteItem(material.id, material.name, material.icon_path, material.frame_path))
+        palette.add_item(category_item)
+    palette.update_atlas()
 
     return palette
@@ -0,0 +1,99 @@
+# ./src/profiler.py
+import json
+import os
+import time
+from collections import deque
+import pygame
+from appdirs import AppDirs
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+dirs = AppDirs("ParticlePlayground")
+
+class FrameProfiler:
+    def __init__(self, history=600, window=60):
+        self.frames = deque(maxlen=history)
+        self.window = window
+        self.visible = False
+        self.font = None
+        self.frame_start = None
+        self.last_lap = None
+        self.sections = []
+        self.counters = {}
+        self.units = {}
+
+    def toggle(self):
+        self.visible = not self.visible
+        logger.debug(f"Profiler overlay {'shown' if self.visible else 'hidden'}")
+
+    def begin_frame(self):
+        self.frame_start = self.last_lap = time.perf_counter()
+        self.sections = []
+
+    def lap(self, name):
+        # Closes the section that started at the previous lap (or frame start)
+        now = time.perf_counter()
+        self.sections.append((name, self.last_lap, now - self.last_lap))
+        self.last_lap = now
+
+    def set_counter(self, name, value, unit=""):
+        # Values stay numbers for the trace's counter track; the unit is
+        # only for the overlay
+        self.counters[name] = value
+        self.units[name] = unit
+
+    def end_frame(self):
+        if self.frame_start is None:
+            return
+        self.frames.append((self.frame_start, time.perf_counter() - self.frame_start, self.sections, dict(self.counters)))
+        self.frame_start = None
+
+    def averages(self):
+        recent = list(self.frames)[-self.window:]
+        if not recent:
+            return 0.0, {}
+        totals = {}
+        for _, _, sections, _ in recent:
+            for name, _, duration in sections:
+                totals[name] = totals.get(name, 0.0) + duration
+        frame_time = sum(frame[1] for frame in recent) / len(recent)
+        return frame_time, {name: total / len(recent) for name, total in totals.items()}
+
+    def draw(self, screen):
+        if not self.visible:
+            return None
+        if self.font is None:
+            self.font = pygame.font.Font(None, 20)
+        frame_time, sections = self.averages()
+        lines = [f"frame {frame_time * 1000:6.2f} ms ({1 / frame_time if frame_time else 0:.0f} fps)"]
+        lines += [f"  {name:<10} {duration * 1000:6.2f} ms" for name, duration in sections.items()]
+        lines += [f"{name}: {value}{self.units.get(name, '')}" for name, value in self.counters.items()]
+        line_height = self.font.get_linesize()
+        panel = pygame.Surface((230, line_height * len(lines) + 10), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 180))
+        for i, line in enumerate(lines):
+            panel.blit(self.font.render(line, True, (0, 255, 0)), (5, 5 + i * line_height))
+        return screen.blit(panel, (10, 10))
+
+    def export_chrome_trace(self, path=None, last=None):
+        frames = list(self.frames)
+        if last is not None:
+            frames = frames[-last:]
+        if path is None:
+            path = os.path.join(dirs.user_cache_dir, "traces", f"trace-{time.strftime('%Y%m%d-%H%M%S')}.json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        events = []
+        for frame_start, frame_time, sections, counters in frames:
+            events.append({"name": "frame", "ph": "X", "pid": 1, "tid": 1,
+                           "ts": frame_start * 1e6, "dur": frame_time * 1e6})
+            for name, start, duration in sections:
+                events.append({"name": name, "ph": "X", "pid": 1, "tid": 2,
+                               "ts": start * 1e6, "dur": duration * 1e6})
+            if counters:
+                events.append({"name": "counters", "ph": "C", "pid": 1, "tid": 1,
+                               "ts": frame_start * 1e6, "args": counters})
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        logger.info(f"Exported {len(frames)} frames to Chrome trace {path}")
+        return path
@@ -0,0 +1,112 @@
+# ./src/renderer.py
+import numpy as np
+import pygame
+from src.simulation import colour_table
+from src.simulation.chunks import chunk_runs
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+class Renderer:
+    def __init__(self, grid_width, grid_height):
+        self.world_surface = None
+        self.scaled_surface = None
+        self.scaled_stale = True
+        self.lut = None
+        self.resize(grid_width, grid_height)
+
+    def resize(self, grid_width, grid_height):
+        if self.world_surface is not None and self.world_surface.get_size() == (grid_width, grid_height):
+            return
+        self.world_surface = pygame.Surface((grid_width, grid_height), 0, 32)
+        self.lut = self.build_lut(self.world_surface)
+        self.scaled_stale = True
+        logger.info(f"Renderer world surface resized to {grid_width}x{grid_height}")
+
+    @staticmethod
+    def build_lut(surface):
+        pixels = pygame.surfarray.pixels2d(surface)
+        dtype = pixels.dtype
+        del pixels
+        return np.array([surface.map_rgb(colour) for colour in colour_table()], dtype=dtype)
+
+    def draw(self, grid, chunks):
+        # One LUT pass per run of dirty chunks writes material colours
+        # straight into the surface's pixels; clean chunks keep last frame's.
+        # Returns the recoloured areas, in cells.
+        dirty = chunks.take_dirty()
+        if not dirty.any():
+            return []
+        rects = []
+        pixels = pygame.surfarray.pixels2d(self.world_surface)
+        for chunk_row in range(chunks.rows):
+            for start, stop in chunk_runs(dirty[chunk_row]):
+                x0, x1, y0, y1 = chunks.bounds(chunk_row, start, stop)
+                np.take(self.lut, grid.material[y0:y1, x0:x1].T, out=pixels[x0:x1, y0:y1], mode="clip")
+                rects.append(pygame.Rect(x0, y0, x1 - x0, y1 - y0))
+        del pixels
+        self.scaled_stale = True
+        return rects
+
+    def cells_to_screen(self, rect, size):
+        # Screen pixel x shows cell x * grid_width // screen_width, so a run of
+        # cells starts at the first pixel that maps into it
+        grid_width, grid_height = self.world_surface.get_size()
+        left = -(-rect.left * size[0] // grid_width)
+        right = -(-rect.right * size[0] // grid_width)
+        top = -(-rect.top * size[1] // grid_height)
+        bottom = -(-rect.bottom * size[1] // grid_height)
+        return pygame.Rect(left, top, right - left, bottom - top)
+
+    def screen_to_cells(self, rect, size):
+        grid_width, grid_height = self.world_surface.get_size()
+        left = rect.left * grid_width // size[0]
+        right = min(grid_width, (rect.right - 1) * grid_width // size[0] + 1)
+        top = rect.top * grid_height // size[1]
+        bottom = min(grid_height, (rect.bottom - 1) * grid_height // size[1] + 1)
+        return pygame.Rect(left, top, right - left, bottom - top)
+
+    def scaled(self, size):
+        # The world at window size, rescaled as a whole whenever it changed.
+        # Scaling cells one rect at a time only matches the whole-surface
+        # scale when the window is a whole multiple of the grid, otherwise
+        # the rounding differs at rect edges and leaves seams.
+        if self.scaled_surface is None or self.scaled_surface.get_size() != size:
+            self.scaled_surface = pygame.Surface(size, 0, self.world_surface)
+            self.scaled_stale = True
+        if self.scaled_stale:
+            pygame.transform.scale(self.world_surface, size, self.scaled_surface)
+            self.scaled_stale = False
+        return self.scaled_surface
+
+    def present(self, screen, rects=None):
+        size = screen.get_size()
+        grid_width, grid_height = self.world_surface.get_size()
+        whole_multiple = size[0] % grid_width == 0 and size[1] % grid_height == 0
+        if rects is None:
+            if size == self.world_surface.get_size():
+                screen.blit(self.world_surface, (0, 0))
+            elif whole_multiple:
+                pygame.transform.scale(self.world_surface, size, screen)
+            else:
+                screen.blit(self.scaled(size), (0, 0))
+            return
+        if not whole_multiple:
+            scaled = self.scaled(size)
+            for rect in rects:
+                screen.blit(scaled, rect, rect)
+            return
+        screen_rect = screen.get_rect()
+        for rect in rects:
+            rect = rect.clip(screen_rect)
+            if not rect.w or not rect.h:
+                continue
+            # Widen to whole cells so neighbouring redraws meet without seams
+            cells = self.screen_to_cells(rect, size)
+            target = self.cells_to_screen(cells, size).clip(screen_rect)
+            if not target.w or not target.h:
+                continue
+            if size == self.world_surface.get_size():
+                screen.blit(self.world_surface, target, cells)
+            else:
+                pygame.transform.scale(self.world_surface.subsurface(cells), target.size, screen.subsurface(target))
@@ -0,0 +1,118 @@
+# ./src/replay.py
+import json
+import os
+import struct
+import pygame
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+MAGIC = b"PPREPLAY"
+VERSION = 2
+# magic, version, metadata length; the metadata is JSON
+HEADER = struct.Struct("<8sHI")
+# frame number, simulation ticks run, world chunks loaded, event count
+FRAME = struct.Struct("<IHIH")
+EVENT_CODE = struct.Struct("<B")
+
+# Event code -> (pygame event type, payload layout, attributes packed)
+EVENT_FORMATS = {
+    1: (pygame.QUIT, struct.Struct("<"), ()),
+    2: (pygame.VIDEORESIZE, struct.Struct("<ii"), ("w", "h")),
+    3: (pygame.MOUSEMOTION, struct.Struct("<iiB"), ("x", "y", "buttons")),
+    4: (pygame.MOUSEBUTTONDOWN, struct.Struct("<iiB"), ("x", "y", "button")),
+    5: (pygame.MOUSEBUTTONUP, struct.Struct("<iiB"), ("x", "y", "button")),
+    6: (pygame.MOUSEWHEEL, struct.Struct("<ii"), ("x", "y")),
+    7: (pygame.KEYDOWN, struct.Struct("<iiI"), ("key", "mod", "unicode")),
+    8: (pygame.KEYUP, struct.Struct("<iiI"), ("key", "mod", "unicode")),
+    9: (pygame.WINDOWFOCUSGAINED, struct.Struct("<"), ()),
+}
+EVENT_CODES = {event_type: code for code, (event_type, _, _) in EVENT_FORMATS.items()}
+
+def encode_event(event):
+    code = EVENT_CODES.get(event.type)
+    if code is None:
+        return None
+    _, layout, _ = EVENT_FORMATS[code]
+    if event.type == pygame.VIDEORESIZE:
+        values = (event.w, event.h)
+    elif event.type == pygame.MOUSEMOTION:
+        buttons = sum(1 << i for i, pressed in enumerate(event.buttons) if pressed)
+        values = (event.pos[0], event.pos[1], buttons)
+    elif event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+        values = (event.pos[0], event.pos[1], event.button)
+    elif event.type == pygame.MOUSEWHEEL:
+        values = (event.x, event.y)
+    elif event.type in (pygame.KEYDOWN, pygame.KEYUP):
+        values = (event.key, event.mod, ord(event.unicode[0]) if getattr(event, "unicode", "") else 0)
+    else:
+        values = ()
+    return EVENT_CODE.pack(code) + layout.pack(*values)
+
+def decode_event(code, values):
+    event_type = EVENT_FORMATS[code][0]
+    if event_type == pygame.VIDEORESIZE:
+        w, h = values
+        return pygame.event.Event(event_type, size=(w, h), w=w, h=h)
+    if event_type == pygame.MOUSEMOTION:
+        x, y, buttons = values
+        return pygame.event.Event(event_type, pos=(x, y), rel=(0, 0), buttons=tuple(bool(buttons & (1 << i)) for i in range(3)))
+    if event_type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+        x, y, button = values
+        return pygame.event.Event(event_type, pos=(x, y), button=button)
+    if event_type == pygame.MOUSEWHEEL:
+        x, y = values
+        return pygame.event.Event(event_type, x=x, y=y, flipped=False, precise_x=float(x), precise_y=float(y))
+    if event_type in (pygame.KEYDOWN, pygame.KEYUP):
+        key, mod, unicode = values
+        return pygame.event.Event(event_type, key=key, mod=mod, unicode=chr(unicode) if unicode else "")
+    return pygame.event.Event(event_type)
+
+class ReplayRecorder:
+    def __init__(self, path, metadata):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.file = open(path, "wb")
+        encoded = json.dumps(metadata).encode()
+        self.file.write(HEADER.pack(MAGIC, VERSION, len(encoded)))
+        self.file.write(encoded)
+        self.frame = 0
+        logger.info(f"Recording replay to {path}")
+
+    def record_frame(self, events, ticks, chunks=0):
+        encoded = [data for data in (encode_event(event) for event in events) if data is not None]
+        self.file.write(FRAME.pack(self.frame, ticks, chunks, len(encoded)))
+        self.file.write(b"".join(encoded))
+        self.frame += 1
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+            logger.info(f"Recorded {self.frame} frames to {self.path}")
+
+class ReplayReader:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        magic, version, metadata_length = HEADER.unpack(self.file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            self.file.close()
+            raise ValueError(f"{path} is not a version {VERSION} replay")
+        self.metadata = json.loads(self.file.read(metadata_length))
+        self.frame = 0
+        logger.info(f"Replaying {path}")
+
+    def next_frame(self):
+        header = self.file.read(FRAME.size)
+        if len(header) < FRAME.size:
+            return None
+        self.frame, ticks, chunks, count = FRAME.unpack(header)
+        events = []
+        for _ in range(count):
+            (code,) = EVENT_CODE.unpack(self.file.read(EVENT_CODE.size))
+            layout = EVENT_FORMATS[code][1]
+            events.append(decode_event(code, layout.unpack(self.file.read(layout.size))))
+        return events, ticks, chunks
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,4 @@
+from src.simulation.engine import Simulation
+from src.simulation.grid import Grid
+from src.simulation.materials import EMPTY, registry, material_id, colour_table
+from src.simulation.world_file import LOAD_ERRORS, save_world, WorldFile, WorldLoader
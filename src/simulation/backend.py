@@ -0,0 +1,46 @@
+# ./src/simulation/backend.py
+import os
+from appdirs import AppDirs
+from src.simulation import kernels
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+dirs = AppDirs("ParticlePlayground")
+
+BACKENDS = ("auto", "numpy", "numba")
+
+class KernelBackend:
+    def __init__(self, name, module):
+        self.name = name
+        self.step_reactions = module.step_reactions
+        self.step_movement = module.step_movement
+        self.step_heat = module.step_heat
+
+numpy_backend = KernelBackend("numpy", kernels)
+numba_backend = None
+
+def load_numba_backend():
+    global numba_backend
+    if numba_backend is None:
+        # Compiled kernels are cached on disk, so only the first run after an
+        # install or an update pays for JIT compilation
+        os.environ.setdefault("NUMBA_CACHE_DIR", os.path.join(dirs.user_cache_dir, "numba"))
+        from src.simulation import kernels_numba
+        numba_backend = KernelBackend("numba", kernels_numba)
+    return numba_backend
+
+def load_backend(name="auto"):
+    if name not in BACKENDS:
+        logger.warning(f"Unknown kernel backend '{name}'. Using auto selection.")
+        name = "auto"
+    if name == "numpy":
+        return numpy_backend
+    try:
+        backend = load_numba_backend()
+    except ImportError:
+        if name == "numba":
+            logger.warning("Numba is not installed. Falling back to the NumPy kernels.")
+        return numpy_backend
+    logger.info("Using the Numba kernel backend")
+    return backend
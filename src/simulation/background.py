@@ -0,0 +1,272 @@
+# ./src/simulation/background.py
+import multiprocessing
+import queue
+from multiprocessing import shared_memory
+import numpy as np
+from src.simulation.backend import load_backend
+from src.simulation.chunks import CHUNK_SIZE, ChunkMap
+from src.simulation.engine import Simulation
+from src.simulation.history import DEFAULT_BUDGET
+from src.simulation.world_file import LOAD_ERRORS, save_world, WorldFile, WorldLoader
+from src.timestep import FixedTimestep
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Header slots. Only the worker writes PUBLISHED and the stats, only the UI
+# writes ACQUIRED, so neither side needs a lock.
+PUBLISHED, ACQUIRED, TICK_COUNT, PARTICLES, AWAKE_CHUNKS = range(5)
+HEADER_SLOTS = 8
+
+class SharedFrames:
+    # Two completed frames of materials, plus the chunks each one changed,
+    # in one shared memory block. Frame n lives in buffer n % 2.
+    def __init__(self, width, height, name=None, chunk_size=CHUNK_SIZE):
+        self.width = width
+        self.height = height
+        rows, cols = -(-height // chunk_size), -(-width // chunk_size)
+        header_size = HEADER_SLOTS * 8
+        size = header_size + 2 * width * height + 2 * rows * cols
+        self.memory = shared_memory.SharedMemory(name=name, create=name is None, size=size if name is None else 0)
+        self.name = self.memory.name
+        buffer = self.memory.buf
+        self.header = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=buffer)
+        self.material = np.ndarray((2, height, width), dtype=np.uint8, buffer=buffer, offset=header_size)
+        self.dirty = np.ndarray((2, rows, cols), dtype=bool, buffer=buffer, offset=header_size + 2 * width * height)
+        if name is None:
+            self.header.fill(0)
+
+    def publish(self, simulation, dirty):
+        # The back buffer is only free once the UI has moved on to the
+        # newest frame; until then the worker keeps simulating and retries
+        header = self.header
+        published = int(header[PUBLISHED])
+        if header[ACQUIRED] != published:
+            return False
+        back = (published + 1) % 2
+        self.material[back] = simulation.grid.material
+        self.dirty[back] = dirty
+        header[TICK_COUNT] = simulation.tick_count
+        header[PARTICLES] = simulation.count_particles()
+        header[AWAKE_CHUNKS] = simulation.count_awake_chunks()
+        header[PUBLISHED] = published + 1
+        return True
+
+    def acquire(self):
+        # Take the newest frame, which releases the one taken before it
+        header = self.header
+        published = int(header[PUBLISHED])
+        if published == header[ACQUIRED]:
+            return None
+        header[ACQUIRED] = published
+        return published % 2
+
+    def close(self, unlink=False):
+        self.header = self.material = self.dirty = None
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
+
+class SharedGrid:
+    # What the renderer and brush need of a Grid: its size and the materials
+    # of the frame on screen
+    def __init__(self, frames):
+        self.width = frames.width
+        self.height = frames.height
+        self.material = frames.material[0]
+
+class SimulationWorker:
+    def __init__(self, commands, name, width, height, seed, workers, heat_interval, backend, undo_budget, tick_rate, max_catch_up_ticks):
+        self.commands = commands
+        self.simulation = Simulation(width, height, seed=seed, workers=workers, heat_interval=heat_interval,
+                                     backend=load_backend(backend), undo_budget=undo_budget)
+        self.frames = SharedFrames(width, height, name)
+        self.timestep = FixedTimestep(tick_rate, max_catch_up_ticks)
+        # Chunks changed since the last published frame
+        self.pending = np.ones_like(self.simulation.chunks.dirty)
+        self.running = True
+
+    def run(self):
+        simulation = self.simulation
+        timestep = self.timestep
+        try:
+            while self.running:
+                ticks = timestep.advance()
+                if not ticks:
+                    # Sleep until the next tick is due or a command arrives
+                    self.take_commands(max(0.0, timestep.tick_duration - timestep.accumulator))
+                # Commands are taken between ticks too, so edits land within
+                # a tick however long a catch-up batch runs
+                for _ in range(ticks):
+                    self.take_commands()
+                    if not self.running:
+                        return
+                    simulation.step()
+                self.pending |= simulation.chunks.take_dirty()
+                if self.pending.any() and self.frames.publish(simulation, self.pending):
+                    self.pending.fill(False)
+        except Exception as e:
+            logger.exception(f"Simulation process failed: {e}")
+        finally:
+            self.frames.close()
+            simulation.close()
+
+    def take_commands(self, timeout=None):
+        while self.running:
+            try:
+                batch = self.commands.get(timeout=timeout) if timeout else self.commands.get_nowait()
+            except queue.Empty:
+                return
+            timeout = None
+            for command, *args in batch:
+                self.apply(command, args)
+
+    def apply(self, command, args):
+        simulation = self.simulation
+        if command == "close":
+            self.running = False
+        elif command in ("resize", "load_world"):
+            *path, width, height, name = args
+            if path:
+                try:
+                    WorldLoader(WorldFile(path[0]), simulation).load(budget=float("inf"))
+                except LOAD_ERRORS as e:
+                    logger.warning(f"Could not load world {path[0]}: {e}")
+            if (simulation.grid.width, simulation.grid.height) != (width, height):
+                # The UI sized the new frames before the file was read
+                simulation.resize(width, height)
+            self.frames.close()
+            self.frames = SharedFrames(width, height, name)
+            self.pending = np.ones_like(simulation.chunks.dirty)
+        elif command == "save_world":
+            save_world(args[0], simulation.grid)
+        else:
+            getattr(simulation, command)(*args)
+
+def run_worker(*args):
+    SimulationWorker(*args).run()
+
+class BackgroundSimulation:
+    # Runs the simulation in its own process, so a heavy tick can't hold the
+    # GIL while the UI handles events and draws. The UI reads the latest
+    # completed frame straight out of shared memory and queues its edits
+    # once per frame.
+    def __init__(self, width, height, seed=None, workers=0, heat_interval=1, backend="auto",
+                 undo_budget=DEFAULT_BUDGET, tick_rate=60, max_catch_up_ticks=5):
+        if seed is None:
+            seed = int(np.random.SeedSequence().entropy % (2 ** 32))
+        self.seed = seed
+        self.heat_interval = max(1, int(heat_interval))
+        self.frames = SharedFrames(width, height)
+        self.grid = SharedGrid(self.frames)
+        self.chunks = ChunkMap(width, height)
+        self.retired = []
+        self.commands = []
+        # Saves are written by the worker later on, so the size of a world
+        # saved this session is known before its file is
+        self.saved_sizes = {}
+        self.editing = False
+        # Spawned rather than forked, so the worker starts without the UI's SDL state
+        context = multiprocessing.get_context("spawn")
+        # The queue's feeder thread does the pipe writes, so a put never
+        # blocks the frame however far behind the worker is
+        self.queue = context.Queue()
+        self.process = context.Process(
+            target=run_worker, name="simulation", daemon=True,
+            args=(self.queue, self.frames.name, width, height, seed, workers, self.heat_interval,
+                  backend, undo_budget, tick_rate, max_catch_up_ticks),
+        )
+        self.process.start()
+        logger.info(f"Background simulation started: {width}x{height}, seed {seed}, pid {self.process.pid}")
+
+    @property
+    def tick_count(self):
+        return int(self.frames.header[TICK_COUNT])
+
+    def paint_mask(self, left, top, mask, material):
+        self.commands.append(("paint_mask", left, top, mask, material))
+
+    def begin_edit(self):
+        if not self.editing:
+            self.editing = True
+            self.commands.append(("begin_edit",))
+
+    def end_edit(self):
+        if self.editing:
+            self.editing = False
+            self.commands.append(("end_edit",))
+
+    def undo(self):
+        self.commands.append(("undo",))
+
+    def redo(self):
+        self.commands.append(("redo",))
+
+    def set_undo_budget(self, budget):
+        self.commands.append(("set_undo_budget", budget))
+
+    def save_world(self, path):
+        self.saved_sizes[path] = (self.grid.width, self.grid.height)
+        self.commands.append(("save_world", path))
+
+    def load_world(self, path):
+        if path in self.saved_sizes:
+            width, height = self.saved_sizes[path]
+        else:
+            world_file = WorldFile(path)
+            width, height = world_file.width, world_file.height
+            world_file.close()
+        self.replace_frames(width, height)
+        self.commands.append(("load_world", path, width, height, self.frames.name))
+
+    def resize(self, width, height):
+        if (width, height) == (self.grid.width, self.grid.height):
+            return
+        logger.info(f"Resizing background simulation grid to {width}x{height}")
+        self.replace_frames(width, height)
+        self.commands.append(("resize", width, height, self.frames.name))
+
+    def replace_frames(self, width, height):
+        # The worker attaches to the new block when it gets the command, and
+        # the old ones are kept until then so it can still find them by name
+        self.retired.append(self.frames)
+        self.frames = SharedFrames(width, height)
+        self.grid = SharedGrid(self.frames)
+        self.chunks = ChunkMap(width, height)
+
+    def sync(self):
+        # Once per frame: hand over this frame's edits, then switch the grid
+        # to the newest completed frame, if there is one
+        if not self.process.is_alive():
+            raise RuntimeError("The simulation process exited unexpectedly")
+        if self.commands:
+            self.queue.put(self.commands)
+            self.commands = []
+        front = self.frames.acquire()
+        if front is not None:
+            self.grid.material = self.frames.material[front]
+            self.chunks.dirty |= self.frames.dirty[front]
+            # A frame in the newest block means the worker is done with the older ones
+            for frames in self.retired:
+                frames.close(unlink=True)
+            self.retired = []
+
+    def close(self):
+        self.queue.put([("close",)])
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            logger.warning("Simulation process did not stop, terminating it")
+            self.process.terminate()
+        # Don't wait on the feeder thread if the worker never read everything
+        self.queue.cancel_join_thread()
+        self.queue.close()
+        self.grid = None
+        for frames in self.retired + [self.frames]:
+            frames.close(unlink=True)
+        logger.info("Background simulation stopped")
+
+    def count_particles(self):
+        return int(self.frames.header[PARTICLES])
+
+    def count_awake_chunks(self):
+        return int(self.frames.header[AWAKE_CHUNKS])
@@ -0,0 +1,75 @@
+# ./src/simulation/chunks.py
+import numpy as np
+
+CHUNK_SIZE = 32
+
+def chunk_runs(mask_row):
+    # Contiguous runs of set chunks in one chunk row, as (start, stop) pairs
+    padded = np.concatenate(([False], mask_row, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return list(zip(edges[::2].tolist(), edges[1::2].tolist()))
+
+def dilate(mask):
+    grown = mask.copy()
+    grown[1:, :] |= mask[:-1, :]
+    grown[:-1, :] |= mask[1:, :]
+    rows = grown.copy()
+    grown[:, 1:] |= rows[:, :-1]
+    grown[:, :-1] |= rows[:, 1:]
+    return grown
+
+class ChunkMap:
+    def __init__(self, width, height, chunk_size=CHUNK_SIZE):
+        self.width = width
+        self.height = height
+        self.chunk_size = chunk_size
+        self.rows = -(-height // chunk_size)
+        self.cols = -(-width // chunk_size)
+        shape = (self.rows, self.cols)
+        # awake: simulated this tick, changed: touched during this tick,
+        # dirty: changed since the renderer last redrew the chunk
+        self.awake = np.ones(shape, dtype=bool)
+        self.changed = np.zeros(shape, dtype=bool)
+        self.dirty = np.ones(shape, dtype=bool)
+
+    def bounds(self, chunk_row, start, stop=None):
+        if stop is None:
+            stop = start + 1
+        size = self.chunk_size
+        x0, x1 = start * size, min(stop * size, self.width)
+        y0, y1 = chunk_row * size, min((chunk_row + 1) * size, self.height)
+        return x0, x1, y0, y1
+
+    def mark_changed(self, y, xs):
+        self.changed[y // self.chunk_size, xs // self.chunk_size] = True
+
+    def wake_cells(self, x0, y0, x1, y1):
+        size = self.chunk_size
+        top, bottom = max(0, y0 // size - 1), min(self.rows, (y1 - 1) // size + 2)
+        left, right = max(0, x0 // size - 1), min(self.cols, (x1 - 1) // size + 2)
+        self.awake[top:bottom, left:right] = True
+        self.dirty[y0 // size:(y1 - 1) // size + 1, x0 // size:(x1 - 1) // size + 1] = True
+
+    def wake_points(self, ys, xs):
+        touched = np.zeros_like(self.awake)
+        touched[ys // self.chunk_size, xs // self.chunk_size] = True
+        self.awake |= dilate(touched)
+        self.dirty |= touched
+
+    def wake_chunks(self, touched):
+        self.awake |= dilate(touched)
+        self.dirty |= touched
+
+    def end_tick(self):
+        # A chunk stays awake while it or one of its neighbours keeps changing
+        self.awake = dilate(self.changed)
+        self.dirty |= self.changed
+        self.changed.fill(False)
+
+    def take_dirty(self):
+        dirty = self.dirty
+        self.dirty = np.zeros_like(dirty)
+        return dirty
+
+    def awake_count(self):
+        return int(np.count_nonzero(self.awake))
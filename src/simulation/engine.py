@@ -0,0 +1,137 @@
+# ./src/simulation/engine.py
+import numpy as np
+from src.simulation.chunks import ChunkMap, dilate
+from src.simulation.grid import Grid
+from src.simulation.backend import load_backend
+from src.simulation.history import DEFAULT_BUDGET, EditHistory
+from src.simulation.kernels import noise_seed
+from src.simulation.materials import EMPTY, registry
+from src.simulation.scheduler import ChunkScheduler
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Above a quarter per neighbour the explicit stencil overshoots and oscillates
+MAX_CONDUCTIVITY = 0.25
+
+class Simulation:
+    def __init__(self, width, height, seed=None, workers=0, heat_interval=1, backend=None, undo_budget=DEFAULT_BUDGET):
+        self.grid = Grid(width, height)
+        self.chunks = ChunkMap(width, height)
+        self.scheduler = ChunkScheduler(workers)
+        if seed is None:
+            seed = int(np.random.SeedSequence().entropy % (2 ** 32))
+        self.seed = seed
+        self.tick_count = 0
+        self.materials = registry
+        self.kernels = backend if backend is not None else load_backend()
+        # Heat runs every heat_interval ticks, each pass covering that many
+        # ticks' worth of conduction (capped where the stencil stays stable)
+        self.heat_interval = max(1, int(heat_interval))
+        self.conductivity = np.minimum(registry.conductivity * self.heat_interval, MAX_CONDUCTIVITY)
+        self.history = EditHistory(undo_budget)
+        logger.info(f"Simulation initialized: {width}x{height}, seed {seed}, {self.kernels.name} kernels")
+
+    def step(self):
+        grid = self.grid
+        chunks = self.chunks
+        grid.clear_updated()
+        seed = noise_seed(self.seed, self.tick_count)
+        materials = self.materials
+        kernels = self.kernels
+        direction = 1 if self.tick_count % 2 else -1
+        conductivity = self.conductivity if self.tick_count % self.heat_interval == 0 else None
+
+        def step_chunks(x0, x1, y0, y1, columns):
+            if materials.has_reactions:
+                kernels.step_reactions(grid, chunks, materials, seed, x0, x1, y0, y1, columns)
+            kernels.step_movement(grid, chunks, materials, seed, direction, x0, x1, y0, y1, columns)
+            if conductivity is not None:
+                kernels.step_heat(grid, chunks, materials, conductivity, x0, x1, y0, y1, columns)
+
+        # A move can spill one cell out of an awake chunk, so its neighbours
+        # may change too
+        self.history.capture_tick(grid, chunks, dilate(chunks.awake))
+        # Only awake chunks are stepped, in four checkerboard passes
+        self.scheduler.run(chunks, step_chunks)
+        chunks.end_tick()
+        self.tick_count += 1
+
+    def paint(self, x, y, radius, material):
+        grid = self.grid
+        top, bottom = max(0, y - radius), min(grid.height, y + radius + 1)
+        left, right = max(0, x - radius), min(grid.width, x + radius + 1)
+        if top >= bottom or left >= right:
+            return
+        ys, xs = np.ogrid[top:bottom, left:right]
+        self.paint_mask(left, top, (xs - x) ** 2 + (ys - y) ** 2 <= radius * radius, material)
+
+    def paint_mask(self, left, top, mask, material):
+        bottom, right = top + mask.shape[0], left + mask.shape[1]
+        region = self.grid.material[top:bottom, left:right]
+        if material != EMPTY:
+            # Painting only fills empty cells so strokes don't erase what's there
+            mask = mask & (region == EMPTY)
+        if not mask.any():
+            return
+        self.history.capture_rect(self.grid, self.chunks, left, top, right, bottom)
+        region[mask] = material
+        self.grid.temperature[top:bottom, left:right][mask] = self.materials.temperature[material]
+        self.grid.velocity_x[top:bottom, left:right][mask] = 0.0
+        self.grid.velocity_y[top:bottom, left:right][mask] = 0.0
+        self.chunks.wake_cells(left, top, right, bottom)
+
+    def paint_cells(self, ys, xs, material):
+        grid = self.grid
+        if material != EMPTY:
+            empty = grid.material[ys, xs] == EMPTY
+            ys, xs = ys[empty], xs[empty]
+        if not len(ys):
+            return
+        self.history.capture_points(grid, self.chunks, ys, xs)
+        grid.material[ys, xs] = material
+        grid.temperature[ys, xs] = self.materials.temperature[material]
+        grid.velocity_x[ys, xs] = 0.0
+        grid.velocity_y[ys, xs] = 0.0
+        self.chunks.wake_points(ys, xs)
+
+    def begin_edit(self):
+        # Paint from here until end_edit is undone and redone as one step
+        self.history.begin()
+
+    def end_edit(self):
+        self.history.commit()
+
+    def undo(self):
+        if self.history.undo(self.grid, self.chunks):
+            logger.debug("Undid the last edit")
+
+    def redo(self):
+        if self.history.redo(self.grid, self.chunks):
+            logger.debug("Redid the last undone edit")
+
+    def set_undo_budget(self, budget):
+        self.history.set_budget(budget)
+
+    def reset(self, width, height):
+        logger.info(f"Resetting simulation grid to {width}x{height}")
+        self.history.clear()
+        self.grid = Grid(width, height)
+        self.chunks = ChunkMap(width, height)
+
+    def resize(self, width, height):
+        logger.info(f"Resizing simulation grid to {width}x{height}")
+        if (width, height) != (self.grid.width, self.grid.height):
+            # Saved chunks no longer line up with the grid
+            self.history.clear()
+        self.grid.resize(width, height)
+        self.chunks = ChunkMap(self.grid.width, self.grid.height)
+
+    def close(self):
+        self.scheduler.shutdown()
+
+    def count_particles(self):
+        return self.grid.count_particles()
+
+    def count_awake_chunks(self):
+        return self.chunks.awake_count()
@@ -0,0 +1,35 @@
+# ./src/simulation/grid.py
+import numpy as np
+from src.simulation.materials import EMPTY, AMBIENT_TEMPERATURE
+
+class Grid:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        shape = (height, width)
+        self.material = np.full(shape, EMPTY, dtype=np.uint8)
+        self.velocity_x = np.zeros(shape, dtype=np.float32)
+        self.velocity_y = np.zeros(shape, dtype=np.float32)
+        self.temperature = np.full(shape, AMBIENT_TEMPERATURE, dtype=np.float32)
+        self.updated = np.zeros(shape, dtype=bool)
+
+    def planes(self):
+        return (self.material, self.velocity_x, self.velocity_y, self.temperature)
+
+    def resize(self, width, height):
+        if (width, height) == (self.width, self.height):
+            return
+        old_planes = self.planes()
+        old_height, old_width = self.height, self.width
+        self.__init__(width, height)
+        copy_width = min(width, old_width)
+        copy_height = min(height, old_height)
+        # Keep the floor where it is so settled piles stay on the ground
+        for new_plane, old_plane in zip(self.planes(), old_planes):
+            new_plane[height - copy_height:, :copy_width] = old_plane[old_height - copy_height:, :copy_width]
+
+    def clear_updated(self):
+        self.updated.fill(False)
+
+    def count_particles(self):
+        return int(np.count_nonzero(self.material))
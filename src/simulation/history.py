@@ -0,0 +1,164 @@
+# ./src/simulation/history.py
+import zlib
+import numpy as np
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_BUDGET = 64 * 1024 * 1024
+# Speed over ratio: a chunk of mostly empty cells still shrinks a hundredfold
+COMPRESSION_LEVEL = 1
+
+def pack_chunk(grid, x0, x1, y0, y1):
+    return zlib.compress(b"".join(plane[y0:y1, x0:x1].tobytes() for plane in grid.planes()), COMPRESSION_LEVEL)
+
+def unpack_chunk(grid, x0, x1, y0, y1, blob):
+    data = zlib.decompress(blob)
+    shape = (y1 - y0, x1 - x0)
+    offset = 0
+    for plane in grid.planes():
+        size = shape[0] * shape[1] * plane.itemsize
+        plane[y0:y1, x0:x1] = np.frombuffer(data, dtype=plane.dtype, count=shape[0] * shape[1], offset=offset).reshape(shape)
+        offset += size
+
+class Edit:
+    # The chunks one brush operation touched, and every chunk the simulation
+    # changed while it was the latest edit: before holds each chunk as it was
+    # just before its first change, after holds it as it was when undone
+    def __init__(self):
+        self.before = {}
+        self.after = {}
+        self.captured = None
+        self.size = 0
+
+    def add(self, images, key, blob):
+        images[key] = blob
+        self.size += len(blob)
+
+class EditHistory:
+    def __init__(self, budget=DEFAULT_BUDGET):
+        self.budget = budget
+        self.undo_stack = []
+        self.redo_stack = []
+        self.edit = None
+        # The edit taking copy-on-write images: the open one once its first
+        # paint lands, then the latest committed one until the next
+        self.tracked = None
+        self.size = 0
+
+    def set_budget(self, budget):
+        self.budget = budget
+        self.evict()
+
+    def begin(self):
+        if self.edit is None:
+            self.edit = Edit()
+
+    def capture(self, grid, chunks, mask):
+        # Copy-on-write: a chunk is saved the first time the tracked edit
+        # sees it change, before the change lands, and never again
+        edit = self.tracked
+        if edit is None:
+            return
+        if edit.captured is None:
+            edit.captured = np.zeros((chunks.rows, chunks.cols), dtype=bool)
+        new = mask & ~edit.captured
+        if not new.any():
+            return
+        edit.captured |= new
+        size = edit.size
+        for row, col in zip(*np.nonzero(new)):
+            edit.add(edit.before, (int(row), int(col)), pack_chunk(grid, *chunks.bounds(row, col)))
+        if edit is not self.edit:
+            # Already on the undo stack, so it counts against the budget now
+            self.size += edit.size - size
+            self.evict()
+
+    def capture_paint(self, grid, chunks, mask):
+        # The first paint of an open edit makes it the tracked one; an edit
+        # that never paints anything leaves history as it was
+        if self.edit is not None and self.tracked is not self.edit:
+            self.tracked = self.edit
+        self.capture(grid, chunks, mask)
+
+    def capture_rect(self, grid, chunks, x0, y0, x1, y1):
+        size = chunks.chunk_size
+        mask = np.zeros((chunks.rows, chunks.cols), dtype=bool)
+        mask[y0 // size:(y1 - 1) // size + 1, x0 // size:(x1 - 1) // size + 1] = True
+        self.capture_paint(grid, chunks, mask)
+
+    def capture_points(self, grid, chunks, ys, xs):
+        size = chunks.chunk_size
+        mask = np.zeros((chunks.rows, chunks.cols), dtype=bool)
+        mask[ys // size, xs // size] = True
+        self.capture_paint(grid, chunks, mask)
+
+    def capture_tick(self, grid, chunks, mask):
+        # Chunks a tick may change, so undo also rewinds what the painted
+        # particles did afterwards
+        if self.tracked is not None:
+            self.capture(grid, chunks, mask)
+
+    def commit(self):
+        edit = self.edit
+        self.edit = None
+        if edit is None or edit is not self.tracked:
+            return
+        # A new edit forks history, so what was undone can't be redone
+        self.redo_stack.clear()
+        self.undo_stack.append(edit)
+        self.recount()
+        self.evict()
+
+    def undo(self, grid, chunks):
+        self.commit()
+        if not self.undo_stack:
+            return False
+        edit = self.undo_stack.pop()
+        self.tracked = None
+        edit.after.clear()
+        edit.size = sum(len(blob) for blob in edit.before.values())
+        for key in edit.before:
+            edit.add(edit.after, key, pack_chunk(grid, *chunks.bounds(*key)))
+        self.restore(grid, chunks, edit.before)
+        self.redo_stack.append(edit)
+        self.recount()
+        self.evict()
+        return True
+
+    def redo(self, grid, chunks):
+        self.commit()
+        if not self.redo_stack:
+            return False
+        edit = self.redo_stack.pop()
+        self.restore(grid, chunks, edit.after)
+        self.undo_stack.append(edit)
+        self.tracked = edit
+        return True
+
+    def restore(self, grid, chunks, images):
+        touched = np.zeros_like(chunks.awake)
+        for (row, col), blob in images.items():
+            unpack_chunk(grid, *chunks.bounds(row, col), blob)
+            touched[row, col] = True
+        chunks.wake_chunks(touched)
+
+    def recount(self):
+        self.size = sum(edit.size for edit in self.undo_stack) + sum(edit.size for edit in self.redo_stack)
+
+    def evict(self):
+        # Oldest first: the bottom of the undo stack, then the redo furthest away
+        while self.size > self.budget and (self.undo_stack or self.redo_stack):
+            stack = self.undo_stack if self.undo_stack else self.redo_stack
+            edit = stack.pop(0)
+            self.size -= edit.size
+            if edit is self.tracked:
+                self.tracked = None
+            logger.debug(f"Evicted an undo step of {len(edit.before)} chunks ({edit.size} bytes)")
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.edit = None
+        self.tracked = None
+        self.size = 0
@@ -0,0 +1,224 @@
+# ./src/simulation/kernels.py
+import numpy as np
+from src.simulation.materials import EMPTY, STATE_NONE, STATE_LIQUID, STATE_GAS, STATE_SOLID
+
+GRAVITY = 0.5
+MAX_FALL_VELOCITY = 8.0
+
+NEIGHBOURS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+# Temperature changes smaller than this don't keep a chunk awake
+HEAT_EPSILON = np.float32(0.05)
+
+def noise_seed(seed, tick):
+    return (seed * 0x9E3779B1 + tick * 0x85EBCA77) & 0xFFFFFFFF
+
+def cell_noise(seed, ys, xs):
+    # Stateless per-cell hash, so the random choices of a cell never depend
+    # on which chunks were stepped before it
+    h = np.asarray(xs, dtype=np.uint32) * np.uint32(0x9E3779B1)
+    h = h ^ (np.asarray(ys, dtype=np.uint32) * np.uint32(0xC2B2AE35))
+    h ^= np.uint32(seed)
+    h ^= h >> np.uint32(16)
+    h *= np.uint32(0x7FEB352D)
+    h ^= h >> np.uint32(15)
+    h *= np.uint32(0x846CA68B)
+    h ^= h >> np.uint32(16)
+    return h
+
+def _move(grid, chunks, ys, xs, dy, dx):
+    # Flat indices into the contiguous planes are much cheaper than (y, x) pairs.
+    # Every move is a swap, so a cell sinking into a lighter fluid lifts that
+    # fluid into the cell it left; moving into an empty cell swaps with nothing.
+    src = ys * grid.width + xs
+    dst = src + dy * grid.width + dx
+    material, velocity_x, velocity_y, temperature = (plane.reshape(-1) for plane in grid.planes())
+    moving = material[src]
+    material[src] = material[dst]
+    material[dst] = moving
+    temperature[src], temperature[dst] = temperature[dst], temperature[src]
+    # A sideways move leaves the cell with momentum in that direction
+    velocity_x[dst] = dx if dx else velocity_x[src]
+    velocity_x[src] = 0.0
+    velocity_y[dst] = np.minimum(velocity_y[src] + GRAVITY, MAX_FALL_VELOCITY) if dy > 0 else 0.0
+    velocity_y[src] = 0.0
+    updated = grid.updated.reshape(-1)
+    updated[dst] = True
+    # A displaced fluid has moved this tick too, but an emptied cell can still be filled
+    updated[src] = material[src] != EMPTY
+    chunks.mark_changed(ys, xs)
+    chunks.mark_changed(ys + dy, xs + dx)
+
+def _try_move(grid, chunks, materials, first_row, x0, x1, movers, density, dy, dx):
+    # movers covers every other row from first_row of columns x0..x1; a
+    # target may spill one cell outside that block into a neighbouring chunk
+    count = movers.shape[0]
+    i0 = 1 if first_row + dy < 0 else 0
+    i1 = count - 1 if first_row + 2 * (count - 1) + dy >= grid.height else count
+    lo, hi = max(x0 + dx, 0), min(x1 + dx, grid.width)
+    candidates = np.zeros_like(movers)
+    if i0 >= i1 or lo >= hi or not movers.any():
+        return candidates
+    targets = (slice(first_row + 2 * i0 + dy, first_row + 2 * i1 + dy - 1, 2), slice(lo, hi))
+    block = (slice(i0, i1), slice(lo - dx - x0, hi - dx - x0))
+    target = grid.material[targets]
+    free = movers[block] & (target == EMPTY)
+    if dy:
+        # Vertical moves also swap with a fluid that is lighter (falling) or
+        # heavier (rising). Lateral moves only go into empty cells, because a
+        # fluid beside a mover in the same row may be a mover itself.
+        displaceable = movers[block] & materials.fluid[target] & ~grid.updated[targets]
+        if displaceable.any():
+            target_density = materials.density[target]
+            sinks = target_density < density[block] if dy > 0 else target_density > density[block]
+            free |= displaceable & sinks
+    candidates[block] = free
+    ry, rx = np.nonzero(candidates)
+    if ry.size:
+        _move(grid, chunks, first_row + 2 * ry, x0 + rx, dy, dx)
+    return candidates
+
+def _spread(grid, chunks, materials, first_row, x0, x1, movers, density, dy, prefer_left):
+    # Each cell tries its preferred side first, then the other one. Running
+    # the passes one after another means two cells can never claim the same
+    # target in a single tick.
+    left_first = movers & prefer_left
+    right_first = movers & ~prefer_left
+    left_first &= ~_try_move(grid, chunks, materials, first_row, x0, x1, left_first, density, dy, -1)
+    right_first &= ~_try_move(grid, chunks, materials, first_row, x0, x1, right_first, density, dy, 1)
+    right_first &= ~_try_move(grid, chunks, materials, first_row, x0, x1, right_first, density, dy, -1)
+    left_first &= ~_try_move(grid, chunks, materials, first_row, x0, x1, left_first, density, dy, 1)
+    return left_first | right_first
+
+def step_movement(grid, chunks, materials, seed, direction, x0, x1, y0, y1, columns=None):
+    material = grid.material
+    updated = grid.updated
+    # Rows of one parity never move into each other, so each half of the band
+    # is stepped as one 2D operation; the updated plane stops a cell moved by
+    # the first half from moving again in the second
+    for parity in (1, 0):
+        first_row = y0 + (parity - y0) % 2
+        if first_row >= y1:
+            continue
+        rows = slice(first_row, y1, 2)
+        cells = material[rows, x0:x1]
+        state = materials.state[cells]
+        active = (state != STATE_NONE) & (state != STATE_SOLID) & ~updated[rows, x0:x1]
+        if columns is not None:
+            active &= columns
+        if not active.any():
+            continue
+
+        density = materials.density[cells]
+        ys = np.arange(first_row, y1, 2)[:, None]
+        xs = np.arange(x0, x1)[None, :]
+        prefer_left = cell_noise(seed, ys, xs) >= np.uint32(0x80000000)
+        # Fluids keep flowing the way they last moved, so a surface levels out
+        # instead of jittering in place; cells at rest alternate their
+        # preferred side every tick so spreading has no directional bias
+        velocity_x = grid.velocity_x[rows, x0:x1]
+        flow_left = np.where(velocity_x == 0.0, direction < 0, velocity_x < 0.0)
+
+        falling = active & (state != STATE_GAS)
+        if falling.any():
+            falling &= ~_try_move(grid, chunks, materials, first_row, x0, x1, falling, density, 1, 0)
+            falling = _spread(grid, chunks, materials, first_row, x0, x1, falling, density, 1, prefer_left)
+            grid.velocity_y[rows, x0:x1][falling] = 0.0
+            flowing = falling & (state == STATE_LIQUID)
+            if flowing.any():
+                blocked = _spread(grid, chunks, materials, first_row, x0, x1, flowing, density, 0, flow_left)
+                grid.velocity_x[rows, x0:x1][blocked] = 0.0
+
+        rising = active & (state == STATE_GAS)
+        if rising.any():
+            rising &= ~_try_move(grid, chunks, materials, first_row, x0, x1, rising, density, -1, 0)
+            rising = _spread(grid, chunks, materials, first_row, x0, x1, rising, density, -1, prefer_left)
+            if rising.any():
+                blocked = _spread(grid, chunks, materials, first_row, x0, x1, rising, density, 0, flow_left)
+                grid.velocity_x[rows, x0:x1][blocked] = 0.0
+
+def step_reactions(grid, chunks, materials, seed, x0, x1, y0, y1, columns=None):
+    material = grid.material
+    region = material[y0:y1, x0:x1]
+    reactive = materials.reactive[region]
+    if columns is not None:
+        reactive &= columns
+    if not reactive.any():
+        return
+
+    ys = np.arange(y0, y1)[:, None]
+    xs = np.arange(x0, x1)[None, :]
+    products = region.copy()
+    reacted = np.zeros_like(reactive)
+    pending = np.zeros_like(reactive)
+    # Neighbours are only read, and a reaction only rewrites the reacting
+    # cell, so chunks of one checkerboard pass never race each other
+    for direction, (dy, dx) in enumerate(NEIGHBOURS):
+        top, bottom = max(y0 + dy, 0), min(y1 + dy, grid.height)
+        left, right = max(x0 + dx, 0), min(x1 + dx, grid.width)
+        if top >= bottom or left >= right:
+            continue
+        inner = (slice(top - dy - y0, bottom - dy - y0), slice(left - dx - x0, right - dx - x0))
+        cells = region[inner]
+        neighbours = material[top:bottom, left:right]
+        chance = materials.reaction_chance[cells, neighbours]
+        candidates = reactive[inner] & ~reacted[inner] & (chance > 0.0)
+        if not candidates.any():
+            continue
+        roll = cell_noise((seed + direction + 1) & 0xFFFFFFFF, ys[inner[0]], xs[:, inner[1]])
+        hits = candidates & (roll < chance * np.float32(2 ** 32))
+        pending[inner] |= candidates & ~hits
+        products[inner][hits] = materials.reaction_product[cells, neighbours][hits]
+        reacted[inner] |= hits
+
+    # Cells that could still react keep their chunk awake until they do
+    ry, rx = np.nonzero(pending & ~reacted)
+    if ry.size:
+        chunks.mark_changed(y0 + ry, x0 + rx)
+    ry, rx = np.nonzero(reacted)
+    if not ry.size:
+        return
+    region[reacted] = products[reacted]
+    grid.velocity_x[y0:y1, x0:x1][reacted] = 0.0
+    grid.velocity_y[y0:y1, x0:x1][reacted] = 0.0
+    chunks.mark_changed(y0 + ry, x0 + rx)
+
+def step_heat(grid, chunks, materials, conductivity, x0, x1, y0, y1, columns=None):
+    material = grid.material
+    temperature = grid.temperature
+    # The band plus a one-cell halo, which is read but never written
+    top, bottom = max(y0 - 1, 0), min(y1 + 1, grid.height)
+    left, right = max(x0 - 1, 0), min(x1 + 1, grid.width)
+    window = temperature[top:bottom, left:right]
+    inner = (slice(y0 - top, y1 - top), slice(x0 - left, x1 - left))
+    region = temperature[y0:y1, x0:x1]
+    cells = material[y0:y1, x0:x1]
+
+    if window.max() - window.min() > HEAT_EPSILON:
+        # 5-point stencil written as fluxes between touching cells, each
+        # limited by the worse conductor, so heat is conserved
+        k = conductivity[material[top:bottom, left:right]]
+        flux_x = np.minimum(k[:, 1:], k[:, :-1]) * (window[:, 1:] - window[:, :-1])
+        flux_y = np.minimum(k[1:], k[:-1]) * (window[1:] - window[:-1])
+        delta = np.zeros_like(window)
+        delta[:, :-1] += flux_x
+        delta[:, 1:] -= flux_x
+        delta[:-1] += flux_y
+        delta[1:] -= flux_y
+        delta = delta[inner]
+        if columns is not None:
+            delta *= columns
+        region += delta
+        warming = np.abs(delta) > HEAT_EPSILON
+        if warming.any():
+            chunks.mark_changed(y0, x0 + np.flatnonzero(warming.any(axis=0)))
+
+    heated = region > materials.heat_threshold[cells]
+    cooled = region < materials.cool_threshold[cells]
+    if columns is not None:
+        heated &= columns
+        cooled &= columns
+    if not (heated.any() or cooled.any()):
+        return
+    cells[heated] = materials.heat_product[cells[heated]]
+    cells[cooled] = materials.cool_product[cells[cooled]]
+    chunks.mark_changed(y0, x0 + np.flatnonzero((heated | cooled).any(axis=0)))
@@ -0,0 +1,267 @@
+# ./src/simulation/kernels_numba.py
+import numpy as np
+from numba import njit
+from src.simulation.kernels import GRAVITY, MAX_FALL_VELOCITY, NEIGHBOURS, HEAT_EPSILON
+from src.simulation.materials import EMPTY, STATE_NONE, STATE_LIQUID, STATE_GAS, STATE_SOLID
+
+# These kernels step cells one at a time, but in exactly the passes and
+# order-independent sweeps of the NumPy kernels, so both backends produce
+# bit-identical grids. Everything runs with the GIL released, so the chunk
+# scheduler's worker threads overlap just like they do with NumPy.
+
+MASK_32 = np.uint64(0xFFFFFFFF)
+NOISE_X = np.uint64(0x9E3779B1)
+NOISE_Y = np.uint64(0xC2B2AE35)
+NOISE_MIX_1 = np.uint64(0x7FEB352D)
+NOISE_MIX_2 = np.uint64(0x846CA68B)
+HALF_RANGE = np.uint64(0x80000000)
+ROLL_SCALE = np.float32(2 ** 32)
+NEIGHBOUR_OFFSETS = np.array(NEIGHBOURS, dtype=np.int64)
+
+@njit(nogil=True, cache=True)
+def cell_noise(seed, y, x):
+    h = (np.uint64(x) * NOISE_X) & MASK_32
+    h ^= (np.uint64(y) * NOISE_Y) & MASK_32
+    h ^= np.uint64(seed)
+    h ^= h >> np.uint64(16)
+    h = (h * NOISE_MIX_1) & MASK_32
+    h ^= h >> np.uint64(15)
+    h = (h * NOISE_MIX_2) & MASK_32
+    h ^= h >> np.uint64(16)
+    return h
+
+@njit(nogil=True, cache=True)
+def _move(material, velocity_x, velocity_y, temperature, updated, changed, chunk_size, y, x, dy, dx):
+    ty, tx = y + dy, x + dx
+    moving = material[y, x]
+    material[y, x] = material[ty, tx]
+    material[ty, tx] = moving
+    heat = temperature[y, x]
+    temperature[y, x] = temperature[ty, tx]
+    temperature[ty, tx] = heat
+    velocity_x[ty, tx] = dx if dx else velocity_x[y, x]
+    velocity_x[y, x] = 0.0
+    velocity_y[ty, tx] = min(velocity_y[y, x] + GRAVITY, MAX_FALL_VELOCITY) if dy > 0 else 0.0
+    velocity_y[y, x] = 0.0
+    updated[ty, tx] = True
+    updated[y, x] = material[y, x] != EMPTY
+    changed[y // chunk_size, x // chunk_size] = True
+    changed[ty // chunk_size, tx // chunk_size] = True
+
+@njit(nogil=True, cache=True)
+def _sweep(material, velocity_x, velocity_y, temperature, updated, changed, chunk_size,
+           density_table, fluid_table, movers, density, first_row, x0, dy, dx):
+    # One pass of _try_move. Lateral moves sweep against their direction, so
+    # every cell still sees the row as it was before the pass.
+    height, width = material.shape
+    rows, cols = movers.shape
+    for i in range(rows):
+        y = first_row + 2 * i
+        ty = y + dy
+        if ty < 0 or ty >= height:
+            continue
+        for step in range(cols):
+            j = cols - 1 - step if dx < 0 else step
+            if not movers[i, j]:
+                continue
+            tx = x0 + j + dx
+            if tx < 0 or tx >= width:
+                continue
+            target = material[ty, tx]
+            free = target == EMPTY
+            if not free and dy != 0 and fluid_table[target] and not updated[ty, tx]:
+                if dy > 0:
+                    free = density_table[target] < density[i, j]
+                else:
+                    free = density_table[target] > density[i, j]
+            if free:
+                _move(material, velocity_x, velocity_y, temperature, updated, changed, chunk_size, y, x0 + j, dy, dx)
+                movers[i, j] = False
+
+@njit(nogil=True, cache=True)
+def _spread(material, velocity_x, velocity_y, temperature, updated, changed, chunk_size,
+            density_table, fluid_table, movers, density, prefer_left, first_row, x0, dy):
+    left_first = movers & prefer_left
+    right_first = movers & ~prefer_left
+    _sweep(material, velocity_x, velocity_y, temperature, updated, changed, chunk_size,
+           density_table, fluid_table, left_first, density, first_row, x0, dy, -1)
+    _sweep(material, velocity_x, velocity_y, temperature, updated, changed, chunk_size,
+           density_table, fluid_table, right_first, density, first_row, x0, dy, 1)
+    _sweep(material, velocity_x, velocity_y, temperature, updated, changed, chunk_size,
+           density_table, fluid_table, right_first, density, first_row, x0, dy, -1)
+    _sweep(material, velocity_x, velocity_y, temperature, updated, changed, chunk_size,
+           density_table, fluid_table, left_first, density, first_row, x0, dy, 1)
+    return left_first | right_first
+
+@njit(nogil=True, cache=True)
+def _step_movement(material, velocity_x, velocity_y, temperature, updated, changed, chunk_size,
+                   state_table, density_table, fluid_table, seed, direction, x0, x1, y0, y1, columns):
+    cols = x1 - x0
+    for parity in (1, 0):
+        first_row = y0 + (parity - y0) % 2
+        if first_row >= y1:
+            continue
+        rows = (y1 - first_row + 1) // 2
+        falling = np.zeros((rows, cols), dtype=np.bool_)
+        rising = np.zeros((rows, cols), dtype=np.bool_)
+        liquid = np.zeros((rows, cols), dtype=np.bool_)
+        density = np.empty((rows, cols), dtype=np.float32)
+        prefer_left = np.empty((rows, cols), dtype=np.bool_)
+        flow_left = np.empty((rows, cols), dtype=np.bool_)
+        any_falling = False
+        any_rising = False
+        for i in range(rows):
+            y = first_row + 2 * i
+            for j in range(cols):
+                x = x0 + j
+                cell = material[y, x]
+                state = state_table[cell]
+                density[i, j] = density_table[cell]
+                prefer_left[i, j] = cell_noise(seed, y, x) >= HALF_RANGE
+                vx = velocity_x[y, x]
+                flow_left[i, j] = direction < 0 if vx == 0.0 else vx < 0.0
+                liquid[i, j] = state == STATE_LIQUID
+                if state == STATE_NONE or state == STATE_SOLID or updated[y, x] or not columns[j]:
+                    continue
+                if state == STATE_GAS:
+                    rising[i, j] = True
+                    any_rising = True
+                else:
+                    falling[i, j] = True
+                    any_falling = True
+
+        if any_falling:
+            _sweep(material, velocity_x, velocity_y, temperature, updated, changed, chunk_size,
+                   density_table, fluid_table, falling, density, first_row, x0, 1, 0)
+            resting = _spread(material, velocity_x, velocity_y, temperature, updated, changed, chunk_size,
+                              density_table, fluid_table, falling, density, prefer_left, first_row, x0, 1)
+            flowing = resting & liquid
+            for i in range(rows):
+                for j in range(cols):
+                    if resting[i, j]:
+                        velocity_y[first_row + 2 * i, x0 + j] = 0.0
+            blocked = _spread(material, velocity_x, velocity_y, temperature, updated, changed, chunk_size,
+                              density_table, fluid_table, flowing, density, flow_left, first_row, x0, 0)
+            for i in range(rows):
+                for j in range(cols):
+                    if blocked[i, j]:
+                        velocity_x[first_row + 2 * i, x0 + j] = 0.0
+
+        if any_rising:
+            _sweep(material, velocity_x, velocity_y, temperature, updated, changed, chunk_size,
+                   density_table, fluid_table, rising, density, first_row, x0, -1, 0)
+            drifting = _spread(material, velocity_x, velocity_y, temperature, updated, changed, chunk_size,
+                               density_table, fluid_table, rising, density, prefer_left, first_row, x0, -1)
+            blocked = _spread(material, velocity_x, velocity_y, temperature, updated, changed, chunk_size,
+                              density_table, fluid_table, drifting, density, flow_left, first_row, x0, 0)
+            for i in range(rows):
+                for j in range(cols):
+                    if blocked[i, j]:
+                        velocity_x[first_row + 2 * i, x0 + j] = 0.0
+
+@njit(nogil=True, cache=True)
+def _step_reactions(material, velocity_x, velocity_y, changed, chunk_size, reactive, reaction_chance,
+                    reaction_product, seed, x0, x1, y0, y1, columns):
+    height, width = material.shape
+    products = material[y0:y1, x0:x1].copy()
+    reacted = np.zeros((y1 - y0, x1 - x0), dtype=np.bool_)
+    # Neighbours are read before any cell of the band is rewritten
+    for y in range(y0, y1):
+        for x in range(x0, x1):
+            cell = material[y, x]
+            if not reactive[cell] or not columns[x - x0]:
+                continue
+            pending = False
+            for direction in range(NEIGHBOUR_OFFSETS.shape[0]):
+                ny, nx = y + NEIGHBOUR_OFFSETS[direction, 0], x + NEIGHBOUR_OFFSETS[direction, 1]
+                if ny < 0 or ny >= height or nx < 0 or nx >= width:
+                    continue
+                neighbour = material[ny, nx]
+                chance = reaction_chance[cell, neighbour]
+                if not chance > 0.0:
+                    continue
+                roll = cell_noise((seed + direction + 1) & 0xFFFFFFFF, y, x)
+                if np.float64(roll) < np.float64(chance * ROLL_SCALE):
+                    products[y - y0, x - x0] = reaction_product[cell, neighbour]
+                    reacted[y - y0, x - x0] = True
+                    break
+                pending = True
+            if pending or reacted[y - y0, x - x0]:
+                changed[y // chunk_size, x // chunk_size] = True
+    for y in range(y0, y1):
+        for x in range(x0, x1):
+            if reacted[y - y0, x - x0]:
+                material[y, x] = products[y - y0, x - x0]
+                velocity_x[y, x] = 0.0
+                velocity_y[y, x] = 0.0
+
+@njit(nogil=True, cache=True)
+def _step_heat(material, temperature, changed, chunk_size, conductivity, heat_threshold, cool_threshold,
+               heat_product, cool_product, x0, x1, y0, y1, columns):
+    height, width = material.shape
+    top, bottom = max(y0 - 1, 0), min(y1 + 1, height)
+    left, right = max(x0 - 1, 0), min(x1 + 1, width)
+    lowest = temperature[top, left]
+    highest = lowest
+    for y in range(top, bottom):
+        for x in range(left, right):
+            lowest = min(lowest, temperature[y, x])
+            highest = max(highest, temperature[y, x])
+
+    if highest - lowest > HEAT_EPSILON:
+        # Same flux terms, summed in the same order, as the NumPy stencil
+        delta = np.zeros((y1 - y0, x1 - x0), dtype=np.float32)
+        for y in range(y0, y1):
+            for x in range(x0, x1):
+                if not columns[x - x0]:
+                    continue
+                k = conductivity[material[y, x]]
+                t = temperature[y, x]
+                d = np.float32(0.0)
+                if x + 1 < right:
+                    d += min(conductivity[material[y, x + 1]], k) * (temperature[y, x + 1] - t)
+                if x - 1 >= left:
+                    d -= min(k, conductivity[material[y, x - 1]]) * (t - temperature[y, x - 1])
+                if y + 1 < bottom:
+                    d += min(conductivity[material[y + 1, x]], k) * (temperature[y + 1, x] - t)
+                if y - 1 >= top:
+                    d -= min(k, conductivity[material[y - 1, x]]) * (t - temperature[y - 1, x])
+                delta[y - y0, x - x0] = d
+        for y in range(y0, y1):
+            for x in range(x0, x1):
+                d = delta[y - y0, x - x0]
+                temperature[y, x] += d
+                if abs(d) > HEAT_EPSILON:
+                    changed[y0 // chunk_size, x // chunk_size] = True
+
+    for y in range(y0, y1):
+        for x in range(x0, x1):
+            if not columns[x - x0]:
+                continue
+            cell = material[y, x]
+            heated = temperature[y, x] > heat_threshold[cell]
+            cooled = temperature[y, x] < cool_threshold[cell]
+            if heated:
+                material[y, x] = heat_product[material[y, x]]
+            if cooled:
+                material[y, x] = cool_product[material[y, x]]
+            if heated or cooled:
+                changed[y0 // chunk_size, x // chunk_size] = True
+
+def _columns(columns, x0, x1):
+    return np.ones(x1 - x0, dtype=np.bool_) if columns is None else columns
+
+def step_movement(grid, chunks, materials, seed, direction, x0, x1, y0, y1, columns=None):
+    _step_movement(grid.material, grid.velocity_x, grid.velocity_y, grid.temperature, grid.updated,
+                   chunks.changed, chunks.chunk_size, materials.state, materials.density, materials.fluid,
+                   seed, direction, x0, x1, y0, y1, _columns(columns, x0, x1))
+
+def step_reactions(grid, chunks, materials, seed, x0, x1, y0, y1, columns=None):
+    _step_reactions(grid.material, grid.velocity_x, grid.velocity_y, chunks.changed, chunks.chunk_size,
+                    materials.reactive, materials.reaction_chance, materials.reaction_product,
+                    seed, x0, x1, y0, y1, _columns(columns, x0, x1))
+
+def step_heat(grid, chunks, materials, conductivity, x0, x1, y0, y1, columns=None):
+    _step_heat(grid.material, grid.temperature, chunks.changed, chunks.chunk_size, conductivity,
+               materials.heat_threshold, materials.cool_threshold, materials.heat_product, materials.cool_product,
+               x0, x1, y0, y1, _columns(columns, x0, x1))
@@ -0,0 +1,174 @@
+# ./src/simulation/materials.py
+import glob
+import os
+import tomllib
+import numpy as np
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+EMPTY = 0
+
+STATE_NONE = 0
+STATE_POWDER = 1
+STATE_LIQUID = 2
+STATE_GAS = 3
+STATE_SOLID = 4
+
+STATES = {
+    "none": STATE_NONE,
+    "powder": STATE_POWDER,
+    "liquid": STATE_LIQUID,
+    "gas": STATE_GAS,
+    "solid": STATE_SOLID,
+}
+
+AMBIENT_TEMPERATURE = 22.0
+DEFAULT_CONDUCTIVITY = 0.1
+# Air barely conducts, so heat mostly spreads through touching materials
+AIR_CONDUCTIVITY = 0.005
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+MATERIALS_DIR = os.path.join(ROOT_DIR, "assets", "materials")
+DEFAULT_FRAME = "assets/palette/toplevel/frame.png"
+
+class Material:
+    def __init__(self, id, name, colour, density, state, icon_path=None, frame_path=None, reactions=None,
+                 temperature=AMBIENT_TEMPERATURE, conductivity=DEFAULT_CONDUCTIVITY, heats_into=None, cools_into=None):
+        self.id = id
+        self.name = name
+        self.colour = colour
+        self.density = density
+        self.state = state
+        self.icon_path = icon_path
+        self.frame_path = frame_path
+        self.reactions = reactions or []
+        self.temperature = temperature
+        self.conductivity = conductivity
+        self.heats_into = heats_into
+        self.cools_into = cools_into
+        self.index = None
+
+class MaterialCategory:
+    def __init__(self, id, name, icon_path, frame_path):
+        self.id = id
+        self.name = name
+        self.icon_path = icon_path
+        self.frame_path = frame_path
+        self.materials = []
+
+def resolve_asset(path):
+    if path is None or os.path.isabs(path):
+        return path
+    return os.path.join(ROOT_DIR, path)
+
+class MaterialRegistry:
+    def __init__(self):
+        self.materials = [Material("empty", "Empty", (0, 0, 0), 0.0, STATE_NONE, conductivity=AIR_CONDUCTIVITY)]
+        self.materials[0].index = EMPTY
+        self.categories = []
+        self.by_id = {"empty": self.materials[0]}
+
+    def load_directory(self, directory=MATERIALS_DIR):
+        # Files load in name order so material indices are the same every run
+        for path in sorted(glob.glob(os.path.join(directory, "*.toml"))):
+            try:
+                with open(path, "rb") as f:
+                    self.load_definitions(tomllib.load(f))
+            except (tomllib.TOMLDecodeError, KeyError, ValueError) as e:
+                logger.error(f"Error reading material definitions {path}: {e}")
+        self.compile()
+        logger.info(f"Loaded {len(self.materials) - 1} materials in {len(self.categories)} categories")
+        return self
+
+    def load_definitions(self, definitions):
+        category_definition = definitions["category"]
+        frame_path = category_definition.get("frame", DEFAULT_FRAME)
+        category = MaterialCategory(
+            category_definition["id"],
+            category_definition.get("name", category_definition["id"].title()),
+            resolve_asset(category_definition["icon"]),
+            resolve_asset(frame_path),
+        )
+        for definition in definitions.get("materials", []):
+            if definition["id"] in self.by_id:
+                raise ValueError(f"Duplicate material id: {definition['id']}")
+            material = Material(
+                definition["id"],
+                definition.get("name", definition["id"].title()),
+                tuple(definition["colour"]),
+                float(definition.get("density", 1.0)),
+                STATES[definition.get("state", "solid")],
+                resolve_asset(definition.get("icon")),
+                resolve_asset(definition.get("frame", frame_path)),
+                definition.get("reactions", []),
+                float(definition.get("temperature", AMBIENT_TEMPERATURE)),
+                float(definition.get("conductivity", DEFAULT_CONDUCTIVITY)),
+                definition.get("heats_into"),
+                definition.get("cools_into"),
+            )
+            material.index = len(self.materials)
+            self.materials.append(material)
+            self.by_id[material.id] = material
+            category.materials.append(material)
+        self.categories.append(category)
+
+    def compile(self):
+        # Dense tables indexed by material index; the kernels only ever see these
+        count = len(self.materials)
+        if count > 256:
+            raise ValueError(f"At most 255 materials fit in the uint8 material plane, got {count - 1}")
+        self.colours = np.array([material.colour for material in self.materials], dtype=np.uint8)
+        self.density = np.array([material.density for material in self.materials], dtype=np.float32)
+        self.state = np.array([material.state for material in self.materials], dtype=np.uint8)
+        # Liquids and gases can be displaced by anything denser moving into them
+        self.fluid = (self.state == STATE_LIQUID) | (self.state == STATE_GAS)
+        # reaction_product[a, b] is what a becomes next to b, with probability
+        # reaction_chance[a, b] per neighbour per tick
+        self.reaction_product = np.tile(np.arange(count, dtype=np.uint8)[:, None], (1, count))
+        self.reaction_chance = np.zeros((count, count), dtype=np.float32)
+        for material in self.materials:
+            for reaction in material.reactions:
+                partner = self.by_id.get(reaction["with"])
+                product = self.by_id.get(reaction["becomes"])
+                if partner is None or product is None:
+                    logger.warning(f"Ignoring reaction of {material.id} with unknown material: {reaction}")
+                    continue
+                self.reaction_product[material.index, partner.index] = product.index
+                self.reaction_chance[material.index, partner.index] = float(reaction.get("chance", 1.0))
+        self.reactive = self.reaction_chance.any(axis=1)
+
+        self.temperature = np.array([material.temperature for material in self.materials], dtype=np.float32)
+        self.conductivity = np.array([material.conductivity for material in self.materials], dtype=np.float32)
+        # A material turns into heat_product above heat_threshold and into
+        # cool_product below cool_threshold; infinite thresholds never trigger
+        self.heat_threshold = np.full(count, np.inf, dtype=np.float32)
+        self.cool_threshold = np.full(count, -np.inf, dtype=np.float32)
+        self.heat_product = np.arange(count, dtype=np.uint8)
+        self.cool_product = np.arange(count, dtype=np.uint8)
+        for material in self.materials:
+            for change, thresholds, products, key in (
+                (material.heats_into, self.heat_threshold, self.heat_product, "above"),
+                (material.cools_into, self.cool_threshold, self.cool_product, "below"),
+            ):
+                if change is None:
+                    continue
+                product = self.by_id.get(change["becomes"])
+                if product is None:
+                    logger.warning(f"Ignoring phase change of {material.id} into unknown material: {change}")
+                    continue
+                thresholds[material.index] = float(change[key])
+                products[material.index] = product.index
+        self.has_reactions = bool(self.reactive.any())
+
+    def material_id(self, name, default=EMPTY):
+        material = self.by_id.get(name)
+        return material.index if material is not None else default
+
+registry = MaterialRegistry().load_directory()
+
+def material_id(name, default=EMPTY):
+    return registry.material_id(name, default)
+
+def colour_table():
+    return registry.colours
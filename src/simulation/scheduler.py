@@ -0,0 +1,51 @@
+# ./src/simulation/scheduler.py
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Chunks of one pass are never neighbours, so a move that spills one cell
+# into a neighbouring chunk can't collide with another chunk of the same pass
+CHECKERBOARD_PASSES = ((0, 0), (1, 0), (0, 1), (1, 1))
+
+class ChunkScheduler:
+    def __init__(self, workers=0):
+        self.workers = workers
+        self.executor = None
+        if workers > 1:
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="simulation")
+        logger.info(f"Chunk scheduler using {'serial' if self.executor is None else f'{workers} worker'} stepping")
+
+    def tasks(self, chunks, pass_x, pass_y):
+        column_parity = np.arange(chunks.cols) % 2 == pass_x
+        tasks = []
+        for chunk_row in range(pass_y, chunks.rows, 2):
+            selected = chunks.awake[chunk_row] & column_parity
+            columns = np.flatnonzero(selected)
+            if not columns.size:
+                continue
+            start, stop = columns[0], columns[-1] + 1
+            x0, x1, y0, y1 = chunks.bounds(chunk_row, start, stop)
+            mask = np.repeat(selected[start:stop], chunks.chunk_size)[:x1 - x0]
+            tasks.append((x0, x1, y0, y1, mask))
+        return tasks
+
+    def run(self, chunks, step):
+        # Every chunk row of a pass is one task. Serial and threaded runs
+        # execute the same tasks in the same passes, so they produce the same grid.
+        for pass_x, pass_y in CHECKERBOARD_PASSES:
+            tasks = self.tasks(chunks, pass_x, pass_y)
+            if self.executor is None or len(tasks) < 2:
+                for task in tasks:
+                    step(*task)
+            else:
+                # NumPy drops the GIL inside its array loops, so the kernels
+                # of one pass overlap on separate cores
+                for future in [self.executor.submit(step, *task) for task in tasks]:
+                    future.result()
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
@@ -0,0 +1,157 @@
+# ./src/simulation/world_file.py
+import mmap
+import os
+import struct
+import time
+import zlib
+import numpy as np
+from src.simulation.materials import EMPTY, AMBIENT_TEMPERATURE
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+MAGIC = b"PPWORLD\0"
+VERSION = 1
+FILE_CHUNK_SIZE = 64
+# magic, version, width, height, chunk size
+HEADER = struct.Struct("<8sHIIH")
+# Planes stored as size 0 are default-filled (empty air, ambient temperature)
+CHUNK_TABLE_DTYPE = np.dtype([("offset", "<u8"), ("material_size", "<u4"), ("temperature_size", "<u4")])
+# What a missing, truncated or corrupt world file can raise while being read
+LOAD_ERRORS = (OSError, ValueError, struct.error, zlib.error)
+
+def save_world(path, grid, chunk_size=FILE_CHUNK_SIZE, level=1):
+    # Chunks are compressed and written one at a time, then the chunk table
+    # is filled in, so the grid is never copied as a whole
+    start = time.perf_counter()
+    rows = -(-grid.height // chunk_size)
+    cols = -(-grid.width // chunk_size)
+    table = np.zeros(rows * cols, dtype=CHUNK_TABLE_DTYPE)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, grid.width, grid.height, chunk_size))
+        table_offset = f.tell()
+        f.write(table.tobytes())
+        offset = f.tell()
+        for index in range(rows * cols):
+            chunk_row, chunk_col = divmod(index, cols)
+            y0, x0 = chunk_row * chunk_size, chunk_col * chunk_size
+            material = grid.material[y0:y0 + chunk_size, x0:x0 + chunk_size]
+            temperature = grid.temperature[y0:y0 + chunk_size, x0:x0 + chunk_size]
+            table[index]["offset"] = offset
+            if material.any():
+                data = zlib.compress(np.ascontiguousarray(material).tobytes(), level)
+                f.write(data)
+                table[index]["material_size"] = len(data)
+                offset += len(data)
+            if not (temperature == AMBIENT_TEMPERATURE).all():
+                data = zlib.compress(np.ascontiguousarray(temperature).tobytes(), level)
+                f.write(data)
+                table[index]["temperature_size"] = len(data)
+                offset += len(data)
+        f.seek(table_offset)
+        f.write(table.tobytes())
+    os.replace(temp_path, path)
+    logger.info(f"Saved {grid.width}x{grid.height} world to {path} in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+class WorldFile:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, self.width, self.height, self.chunk_size = HEADER.unpack_from(self.map, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} world file")
+            if not self.chunk_size:
+                raise ValueError(f"{path} has a chunk size of 0")
+            self.rows = -(-self.height // self.chunk_size)
+            self.cols = -(-self.width // self.chunk_size)
+            # The table is a view straight into the mapped file
+            self.table = np.frombuffer(self.map, dtype=CHUNK_TABLE_DTYPE, count=self.rows * self.cols, offset=HEADER.size)
+        except Exception:
+            self.close()
+            raise
+
+    def chunk_bounds(self, chunk_row, chunk_col):
+        x0, y0 = chunk_col * self.chunk_size, chunk_row * self.chunk_size
+        return x0, y0, min(x0 + self.chunk_size, self.width), min(y0 + self.chunk_size, self.height)
+
+    def read_chunk(self, chunk_row, chunk_col):
+        entry = self.table[chunk_row * self.cols + chunk_col]
+        x0, y0, x1, y1 = self.chunk_bounds(chunk_row, chunk_col)
+        shape = (y1 - y0, x1 - x0)
+        view = memoryview(self.map)
+        offset = int(entry["offset"])
+        material_size = int(entry["material_size"])
+        temperature_size = int(entry["temperature_size"])
+        if material_size:
+            material = np.frombuffer(zlib.decompress(view[offset:offset + material_size]), dtype=np.uint8).reshape(shape)
+        else:
+            material = np.full(shape, EMPTY, dtype=np.uint8)
+        offset += material_size
+        if temperature_size:
+            temperature = np.frombuffer(zlib.decompress(view[offset:offset + temperature_size]), dtype=np.float32).reshape(shape)
+        else:
+            temperature = np.full(shape, AMBIENT_TEMPERATURE, dtype=np.float32)
+        view.release()
+        return material, temperature
+
+    def close(self):
+        if getattr(self, "table", None) is not None:
+            self.table = None
+        if getattr(self, "map", None) is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+class WorldLoader:
+    def __init__(self, world_file, simulation):
+        self.world_file = world_file
+        self.simulation = simulation
+        simulation.reset(world_file.width, world_file.height)
+        self.pending = [(row, col) for row in range(world_file.rows) for col in range(world_file.cols)]
+        self.loaded = 0
+        # Chunks taken off pending, damaged ones included; replays use it to
+        # stream a world in exactly as the recorded session did
+        self.read = 0
+        logger.info(f"Opened {world_file.width}x{world_file.height} world {world_file.path}")
+
+    def load(self, view=None, budget=0.004, limit=None):
+        # Decompress pending chunks nearest the view centre first, stopping
+        # once the time budget for this frame is spent or limit chunks are read
+        if not self.pending:
+            return True
+        if view is None:
+            view = (0, 0, self.world_file.width, self.world_file.height)
+        size = self.world_file.chunk_size
+        centre_col = (view[0] + view[2]) / 2 / size
+        centre_row = (view[1] + view[3]) / 2 / size
+        self.pending.sort(key=lambda chunk: -((chunk[0] + 0.5 - centre_row) ** 2 + (chunk[1] + 0.5 - centre_col) ** 2))
+        deadline = time.perf_counter() + budget
+        grid = self.simulation.grid
+        stop = self.read + limit if limit is not None else None
+        while self.pending and self.read != stop:
+            chunk_row, chunk_col = self.pending.pop()
+            self.read += 1
+            x0, y0, x1, y1 = self.world_file.chunk_bounds(chunk_row, chunk_col)
+            try:
+                material, temperature = self.world_file.read_chunk(chunk_row, chunk_col)
+            except LOAD_ERRORS as e:
+                # A damaged chunk is left empty rather than losing the whole world
+                logger.warning(f"Skipping unreadable chunk ({chunk_row}, {chunk_col}) of {self.world_file.path}: {e}")
+                continue
+            grid.material[y0:y1, x0:x1] = material
+            grid.temperature[y0:y1, x0:x1] = temperature
+            self.simulation.chunks.wake_cells(x0, y0, x1, y1)
+            self.loaded += 1
+            if time.perf_counter() >= deadline:
+                break
+        if not self.pending:
+            logger.info(f"Finished loading {self.loaded} chunks from {self.world_file.path}")
+            self.world_file.close()
+        return not self.pending
+
+    def close(self):
+        self.world_file.close()
@@ -1,5 +1,9 @@
 # ./src/storage.py
+import copy
 import os
+import tempfile
+import threading
+import time
 import tomllib
 import tomli_w
 from appdirs import user_config_dir
@@ -7,15 +11,63 @@ from src.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Changes are written this long after the last set_setting call, so a burst
+# of updates (dragging a window edge, scrolling) becomes a single write
+SAVE_DEBOUNCE_SECONDS = 0.5
+
+_MISSING = object()
+
+class SettingHandle:
+    def __init__(self, keys, raw_value, default=None, type=None):
+        self.keys = keys
+        self.default = default
+        self.type = type
+        self.subscribers = []
+        self.value = self.convert(raw_value)
+
+    def convert(self, raw_value):
+        if raw_value is _MISSING:
+            return self.default
+        if self.type is None:
+            return raw_value
+        try:
+            return self.type(raw_value)
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid value for setting {self.keys}: {raw_value!r}. Using default: {self.default}")
+            return self.default
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+        return callback
+
+    def update(self, raw_value):
+        value = self.convert(raw_value)
+        if value == self.value:
+            return
+        self.value = value
+        for callback in list(self.subscribers):
+            callback(value)
+
 class Storage:
-    def __init__(self):
+    def __init__(self, debounce=SAVE_DEBOUNCE_SECONDS):
         self.app_name = "ParticlePlayground"
+        self.debounce = debounce
+        self.dirty = False
+        self.last_change = 0.0
+        self.save_condition = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.writer = None
+        self.persist = True
+        self.index = {}
+        self.handles = {}
+        self.missing_warned = set()
         self.config_dir = user_config_dir(self.app_name)
         self.config_file = os.path.join(self.config_dir, "settings.toml")
         self.default_settings_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".default_settings.toml")
         logger.info(f"Config file: {self.config_file}")
         logger.info(f"Default settings file: {self.default_settings_file}")
         self.settings = self.load_settings()
+        self.build_index()
 
     def load_settings(self):
         if os.path.exists(self.config_file) and os.path.getsize(self.config_file) > 0:
@@ -41,7 +93,10 @@ class Storage:
                 "cursor": {"size": 5, "max_size": 50},
                 "window": {"width": 800, "height": 600},
                 "selected_particle": "dust",
+                "simulation": {"cell_size": 4, "workers": 0, "backend": "auto", "background": False, "tick_rate": 60, "heat_rate": 30, "max_catch_up_ticks": 5, "undo_memory_mb": 64},
                 "graphics": {
+                    "vsync": False,
+                    "fps_limit": 60,
                     "palette": {
                         "icon_size": 32,
                         "palette_group_selected": "powders"
@@ -52,30 +107,134 @@ class Storage:
             return default_settings
 
     def save_settings(self, settings=None):
-        if settings is None:
-            settings = self.settings
+        if not self.persist:
+            return
+        if settings is not None:
+            with self.write_lock:
+                self.write_settings_file(settings)
+            return
+        with self.write_lock:
+            with self.save_condition:
+                settings = copy.deepcopy(self.settings)
+                self.dirty = False
+            self.write_unsaved(settings)
+
+    def flush(self):
+        if not self.persist:
+            return
+        with self.write_lock:
+            with self.save_condition:
+                if not self.dirty:
+                    return
+                settings = copy.deepcopy(self.settings)
+                self.dirty = False
+            self.write_unsaved(settings)
+
+    def write_unsaved(self, settings):
+        # Clearing dirty before the write keeps a change made during it from
+        # being lost; a failed write sets it again so the changes stay pending
+        try:
+            self.write_settings_file(settings)
+        except OSError:
+            with self.save_condition:
+                self.dirty = True
+            raise
+
+    def write_settings_file(self, settings):
+        # Write to a temp file and rename over the old one, so a crash mid-write
+        # never leaves a truncated settings file behind
         os.makedirs(self.config_dir, exist_ok=True)
-        with open(self.config_file, "wb") as f:
-            logger.info(f"Saving settings to {self.config_file}")
-            tomli_w.dump(settings, f)
+        fd, temp_path = tempfile.mkstemp(dir=self.config_dir, prefix=".settings-", suffix=".toml")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                logger.info(f"Saving settings to {self.config_file}")
+                tomli_w.dump(settings, f)
+            os.replace(temp_path, self.config_file)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def mark_dirty(self):
+        with self.save_condition:
+            self.dirty = True
+            self.last_change = time.monotonic()
+            if not self.persist:
+                return
+            if self.writer is None:
+                self.writer = threading.Thread(target=self.write_behind, name="settings-writer", daemon=True)
+                self.writer.start()
+            self.save_condition.notify()
+
+    def write_behind(self):
+        # After a failed write the writer waits for the next change rather
+        # than retrying in a loop; the flush on exit tries once more too
+        failed_change = None
+        while True:
+            with self.save_condition:
+                while not self.dirty or self.last_change == failed_change:
+                    self.save_condition.wait()
+                while (remaining := self.last_change + self.debounce - time.monotonic()) > 0:
+                    self.save_condition.wait(remaining)
+                change = self.last_change
+            try:
+                self.flush()
+            except OSError as e:
+                failed_change = change
+                logger.error(f"Error saving settings to {self.config_file}: {e}")
+
+    def build_index(self):
+        # Every key path (and prefix of one) maps straight to its value, so
+        # lookups are a single dict hit instead of a walk down nested tables
+        self.index = {}
+
+        def add(prefix, node):
+            for key, value in node.items():
+                keys = prefix + (key,)
+                self.index[keys] = value
+                if isinstance(value, dict):
+                    add(keys, value)
+
+        add((), self.settings)
 
     def get_setting(self, *keys, default=None):
-        value = self.settings
-        for key in keys:
-            if key in value and isinstance(value, dict):
-                value = value[key]
-            else:
+        value = self.index.get(keys, _MISSING)
+        if value is _MISSING:
+            if keys not in self.missing_warned:
+                self.missing_warned.add(keys)
                 logger.warning(f"Setting not found: {keys}. Using default: {default}")
-                return default
-        logger.debug(f"Retrieved setting: {keys} = {value}")
+            return default
         return value
 
+    def handle(self, *keys, default=None, type=None):
+        handle = self.handles.get(keys)
+        if handle is None:
+            handle = SettingHandle(keys, self.index.get(keys, _MISSING), default, type)
+            self.handles[keys] = handle
+        elif (default, type) != (handle.default, handle.type):
+            # Handles are shared, so the first caller's default and type win
+            logger.warning(f"Setting {keys} requested with default {default!r} and type {type}, "
+                           f"but its handle already uses default {handle.default!r} and type {handle.type}")
+        return handle
+
     def set_setting(self, value, *keys):
-        settings = self.settings
-        for key in keys[:-1]:
-            settings = settings.setdefault(key, {})
-        settings[keys[-1]] = value
+        with self.save_condition:
+            settings = self.settings
+            for i, key in enumerate(keys[:-1]):
+                settings = settings.setdefault(key, {})
+                self.index[keys[:i + 1]] = settings
+            settings[keys[-1]] = value
+            if isinstance(value, dict):
+                self.build_index()
+            else:
+                self.index[keys] = value
         logger.debug(f"Setting updated: {keys} = {value}")
-        self.save_settings()
+        self.mark_dirty()
+        self.notify_handles(keys)
+
+    def notify_handles(self, keys):
+        for handle_keys, handle in list(self.handles.items()):
+            # A handle sees the change if it is the key set, or sits below it
+            if handle_keys[:len(keys)] == keys:
+                handle.update(self.index.get(handle_keys, _MISSING))
 
 storage = Storage()
@@ -0,0 +1,30 @@
+# ./src/timestep.py
+import time
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+class FixedTimestep:
+    def __init__(self, tick_rate=60, max_catch_up_ticks=5):
+        self.tick_rate = max(1, tick_rate)
+        self.tick_duration = 1.0 / self.tick_rate
+        self.max_catch_up_ticks = max(1, max_catch_up_ticks)
+        self.accumulator = 0.0
+        self.last_time = time.perf_counter()
+        logger.info(f"Fixed timestep: {self.tick_rate} ticks/s, at most {self.max_catch_up_ticks} ticks per frame")
+
+    def advance(self):
+        now = time.perf_counter()
+        self.accumulator += now - self.last_time
+        self.last_time = now
+        ticks = int(self.accumulator // self.tick_duration)
+        if ticks > self.max_catch_up_ticks:
+            # Past the cap the backlog is dropped instead of carried over,
+            # otherwise every slow frame makes the next one slower
+            dropped = (ticks - self.max_catch_up_ticks) * self.tick_duration
+            logger.debug(f"Simulation fell behind, dropping {dropped * 1000:.1f}ms")
+            ticks = self.max_catch_up_ticks
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= ticks * self.tick_duration
+        return ticks
@@ -0,0 +1,103 @@
+import json
+import os
+import pygame
+from appdirs import AppDirs
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+dirs = AppDirs("ParticlePlayground")
+
+class IconAtlas:
+    def __init__(self, icon_size, columns=16):
+        self.icon_size = icon_size
+        self.columns = columns
+        self.rows = 0
+        self.surface = None
+        self.rects = {}
+        self.keys = {}
+        self.free_slots = []
+
+    def is_current(self, id, key):
+        return self.keys.get(id) == key
+
+    def slot_rect(self, slot):
+        row, column = divmod(slot, self.columns)
+        return pygame.Rect(column * self.icon_size, row * self.icon_size, self.icon_size, self.icon_size)
+
+    def grow(self):
+        # Double the row count and copy the packed icons across
+        rows = max(1, self.rows * 2)
+        surface = pygame.Surface((self.columns * self.icon_size, rows * self.icon_size), pygame.SRCALPHA)
+        if self.surface is not None:
+            surface.blit(self.surface, (0, 0))
+        self.free_slots.extend(range(self.rows * self.columns, rows * self.columns))
+        self.free_slots.sort(reverse=True)
+        self.surface = surface
+        self.rows = rows
+
+    def add(self, id, icon_surface, key=None):
+        rect = self.rects.get(id)
+        if rect is None:
+            if not self.free_slots:
+                self.grow()
+            rect = self.slot_rect(self.free_slots.pop())
+            self.rects[id] = rect
+        # MAX onto a cleared slot copies the pixels, alpha included, unblended
+        self.surface.fill((0, 0, 0, 0), rect)
+        self.surface.blit(icon_surface, rect.topleft, special_flags=pygame.BLEND_RGBA_MAX)
+        self.keys[id] = key
+
+    def blit(self, screen, id, position):
+        rect = self.rects.get(id)
+        if rect is not None:
+            screen.blit(self.surface, position, rect)
+
+    @staticmethod
+    def cache_paths(icon_size):
+        base = os.path.join(dirs.user_cache_dir, "atlas", f"atlas-{icon_size}")
+        return f"{base}.png", f"{base}.json"
+
+    def save(self):
+        if self.surface is None:
+            return
+        image_path, index_path = self.cache_paths(self.icon_size)
+        os.makedirs(os.path.dirname(image_path), exist_ok=True)
+        index = {
+            "icon_size": self.icon_size,
+            "columns": self.columns,
+            "rows": self.rows,
+            "icons": {id: {"rect": list(rect), "key": self.keys.get(id)} for id, rect in self.rects.items()},
+        }
+        pygame.image.save(self.surface, image_path)
+        with open(index_path, "w") as f:
+            json.dump(index, f, indent=1)
+        logger.debug(f"Saved icon atlas to {image_path}")
+
+    @classmethod
+    def load(cls, icon_size):
+        image_path, index_path = cls.cache_paths(icon_size)
+        try:
+            with open(index_path, "r") as f:
+                index = json.load(f)
+            surface = pygame.image.load(image_path).convert_alpha()
+        except FileNotFoundError:
+            return cls(icon_size)
+        except (OSError, ValueError, pygame.error) as e:
+            logger.error(f"Error loading icon atlas {image_path}: {e}. Rebuilding it.")
+            return cls(icon_size)
+        atlas = cls(icon_size, index["columns"])
+        if index["icon_size"] != icon_size or surface.get_size() != (atlas.columns * icon_size, index["rows"] * icon_size):
+            logger.warning(f"Icon atlas {image_path} doesn't match its index. Rebuilding it.")
+            return atlas
+        atlas.surface = surface
+        atlas.rows = index["rows"]
+        used = set()
+        for id, entry in index["icons"].items():
+            rect = pygame.Rect(entry["rect"])
+            atlas.rects[id] = rect
+            atlas.keys[id] = entry["key"]
+            used.add((rect.y // icon_size) * atlas.columns + rect.x // icon_size)
+        atlas.free_slots = sorted(set(range(atlas.rows * atlas.columns)) - used, reverse=True)
+        logger.info(f"Loaded icon atlas with {len(atlas.rects)} icons from {image_path}")
+        return atlas
@@ -1,5 +1,9 @@
 from PIL import Image
+import hashlib
+import json
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor
 from appdirs import AppDirs
 from src.storage import storage
 from src.logger import get_logger
@@ -7,25 +11,117 @@ from src.logger import get_logger
 logger = get_logger(__name__)
 
 dirs = AppDirs("ParticlePlayground")
-icon_size = storage.get_setting("graphics", "palette", "icon_size", default=64)
-
-def process_and_cache_icon(icon_path, frame_path, cache_relative_path):
-    cache_path = os.path.join(dirs.user_cache_dir, cache_relative_path)
-    
-    if not os.path.exists(cache_path):
-        logger.info(f"Generating cached icon for {icon_path}")
-        framed_icon = frameify_icon(icon_path, frame_path)
-        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
-        framed_icon.save(cache_path, "PNG")
-    else:
-        logger.debug(f"Using cached icon from {cache_path}")
-    
+icon_size_setting = storage.handle("graphics", "palette", "icon_size", default=32, type=int)
+
+DEFAULT_PADDING = 10
+# Below this many missing icons, starting worker processes costs more than it saves
+PARALLEL_THRESHOLD = 4
+
+class IconCache:
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.manifest_path = os.path.join(cache_dir, "manifest.json")
+        self.manifest = self.load_manifest()
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path, "r") as f:
+                manifest = json.load(f)
+            if isinstance(manifest, dict):
+                manifest.setdefault("sources", {})
+                manifest.setdefault("icons", {})
+                return manifest
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.error(f"Error reading icon manifest {self.manifest_path}: {e}. Starting a new one.")
+        return {"sources": {}, "icons": {}}
+
+    def save_manifest(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(temp_path, self.manifest_path)
+
+    def source_digest(self, path):
+        # Source hashes are reused while a file's mtime and size are unchanged
+        stat = os.stat(path)
+        path = os.path.abspath(path)
+        entry = self.manifest["sources"].get(path)
+        if entry is None or entry["mtime"] != stat.st_mtime or entry["size"] != stat.st_size:
+            with open(path, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            entry = {"mtime": stat.st_mtime, "size": stat.st_size, "sha256": digest}
+            self.manifest["sources"][path] = entry
+        return entry["sha256"]
+
+    def key(self, icon_path, frame_path, size, padding=DEFAULT_PADDING):
+        parts = (self.source_digest(icon_path), self.source_digest(frame_path), str(size), str(padding))
+        return hashlib.sha256("\0".join(parts).encode()).hexdigest()[:32]
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.png")
+
+    def record(self, key, icon_path, frame_path, size, padding):
+        self.manifest["icons"][key] = {"icon_path": icon_path, "frame_path": frame_path, "size": size, "padding": padding}
+
+    def get_path(self, icon_path, frame_path, size, padding=DEFAULT_PADDING):
+        key = self.key(icon_path, frame_path, size, padding)
+        cache_path = self.path(key)
+        if not os.path.exists(cache_path):
+            logger.info(f"Generating cached icon for {icon_path}")
+            render_icon_file(icon_path, frame_path, size, padding, cache_path)
+            self.record(key, icon_path, frame_path, size, padding)
+            self.save_manifest()
+        else:
+            logger.debug(f"Using cached icon from {cache_path}")
+        return cache_path
+
+    def pregenerate(self, sources, size, padding=DEFAULT_PADDING):
+        missing = {}
+        for icon_path, frame_path in sources:
+            key = self.key(icon_path, frame_path, size, padding)
+            if key not in missing and not os.path.exists(self.path(key)):
+                missing[key] = (icon_path, frame_path)
+        if missing:
+            logger.info(f"Generating {len(missing)} missing icons at size {size}")
+            jobs = [(icon_path, frame_path, size, padding, self.path(key)) for key, (icon_path, frame_path) in missing.items()]
+            if len(jobs) >= PARALLEL_THRESHOLD:
+                # Spawned, not forked: the game process has SDL and the
+                # settings writer thread running, which a fork would copy
+                with ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn")) as executor:
+                    list(executor.map(render_icon_file, *zip(*jobs)))
+            else:
+                for job in jobs:
+                    render_icon_file(*job)
+            for key, (icon_path, frame_path) in missing.items():
+                self.record(key, icon_path, frame_path, size, padding)
+        self.save_manifest()
+        return len(missing)
+
+icon_cache = IconCache(os.path.join(dirs.user_cache_dir, "icons"))
+
+def render_icon_file(icon_path, frame_path, size, padding, cache_path):
+    # Top level so worker processes can run it
+    framed_icon = frameify_icon(icon_path, frame_path, padding, size)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    framed_icon.save(temp_path, "PNG")
+    os.replace(temp_path, cache_path)
     return cache_path
 
-def get_icon(icon_path, frame_path, cache_relative_path):
-    cache_path = process_and_cache_icon(icon_path, frame_path, cache_relative_path)
+def get_icon(icon_path, frame_path, size=None):
+    if size is None:
+        size = icon_size_setting.value
+    cache_path = icon_cache.get_path(icon_path, frame_path, size)
     return Image.open(cache_path).convert("RGBA")
 
+def pregenerate_icons(sources, size=None):
+    if size is None:
+        size = icon_size_setting.value
+    return icon_cache.pregenerate(sources, size)
+
 def get_effective_bounding_box(image):
     alpha = image.split()[3]  # Get the alpha channel
     bbox = alpha.getbbox()
@@ -45,7 +141,7 @@ def save_icon(image, relative_path):
     image.save(save_path)
     return save_path
 
-def frameify_icon(icon_path, frame_path, padding=10):
+def frameify_icon(icon_path, frame_path, padding=DEFAULT_PADDING, size=None):
     frame = Image.open(frame_path).convert("RGBA")
     icon = Image.open(icon_path).convert("RGBA")
 
@@ -79,4 +175,6 @@ def frameify_icon(icon_path, frame_path, padding=10):
     framed_icon.paste(resized_icon, paste_position, resized_icon)
     framed_icon = Image.alpha_composite(framed_icon, frame)
 
-    return resize_image(framed_icon, icon_size, icon_size)
+    if size is None:
+        size = icon_size_setting.value
+    return resize_image(framed_icon, size, size)
@@ -0,0 +1,55 @@
+import numpy as np
+
+class RectIndex:
+    def __init__(self, size, bucket_size=32):
+        self.bucket_size = bucket_size
+        self.columns = max(1, -(-size[0] // bucket_size))
+        self.rows = max(1, -(-size[1] // bucket_size))
+        self.buckets = {}
+        self.occupied = np.zeros((self.rows, self.columns), dtype=bool)
+        self.entries = []
+        self.bounds = np.empty((0, 4), dtype=np.int64)
+
+    def insert(self, rect, value):
+        index = len(self.entries)
+        self.entries.append((rect, value))
+        self.bounds = np.vstack((self.bounds, (rect.left, rect.top, rect.right, rect.bottom)))
+        size = self.bucket_size
+        left, top = max(0, rect.left // size), max(0, rect.top // size)
+        right = min(self.columns, (rect.right - 1) // size + 1)
+        bottom = min(self.rows, (rect.bottom - 1) // size + 1)
+        for row in range(top, bottom):
+            for column in range(left, right):
+                self.buckets.setdefault((row, column), []).append(index)
+        self.occupied[top:bottom, left:right] = True
+
+    def query_point(self, pos):
+        x, y = pos
+        bucket = self.buckets.get((y // self.bucket_size, x // self.bucket_size))
+        if bucket:
+            for index in bucket:
+                rect, value = self.entries[index]
+                if rect.collidepoint(pos):
+                    return value
+        return None
+
+    def contains_points(self, xs, ys):
+        # Points in buckets no rect touches are rejected by one array lookup;
+        # only the rest are tested against the rect bounds
+        xs = np.asarray(xs)
+        ys = np.asarray(ys)
+        blocked = np.zeros(xs.shape, dtype=bool)
+        if not self.entries:
+            return blocked
+        columns = xs // self.bucket_size
+        rows = ys // self.bucket_size
+        inside = (columns >= 0) & (columns < self.columns) & (rows >= 0) & (rows < self.rows)
+        candidates = np.flatnonzero(inside)
+        candidates = candidates[self.occupied[rows.ravel()[candidates], columns.ravel()[candidates]]]
+        if candidates.size:
+            px = xs.ravel()[candidates, None]
+            py = ys.ravel()[candidates, None]
+            left, top, right, bottom = self.bounds.T
+            hit = ((px >= left) & (px < right) & (py >= top) & (py < bottom)).any(axis=1)
+            blocked.ravel()[candidates] = hit
+        return blocked
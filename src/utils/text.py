@@ -0,0 +1,26 @@
+from collections import OrderedDict
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_MAX_ENTRIES = 256
+
+class TextCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+
+    def render(self, font, text, colour, antialias=True):
+        key = (font, text, tuple(colour), antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+        surface = font.render(text, antialias, colour)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            # Least recently drawn text goes first
+            self.surfaces.popitem(last=False)
+        return surface
+
+text_cache = TextCache()
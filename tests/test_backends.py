@@ -0,0 +1,72 @@
+# ./tests/test_backends.py
+import numpy as np
+import pytest
+from src.bench import SCENARIOS
+from src.simulation import Simulation, material_id
+from src.simulation.backend import load_numba_backend, numpy_backend
+from src.simulation.materials import MaterialRegistry
+
+numba = pytest.importorskip("numba")
+
+WIDTH, HEIGHT = 96, 64
+TICKS = 120
+PLANES = ("material", "velocity_x", "velocity_y", "temperature")
+
+@pytest.fixture(scope="module")
+def numba_backend():
+    return load_numba_backend()
+
+@pytest.fixture(scope="module")
+def reacting_materials():
+    # No shipped material reacts, so give a few of them reactions to drive
+    # the reaction kernels
+    materials = MaterialRegistry().load_directory()
+    reactions = {
+        "water": [{"with": "lava", "becomes": "steam", "chance": 0.5}],
+        "lava": [{"with": "water", "becomes": "stone", "chance": 0.25}],
+        "dust": [{"with": "water", "becomes": "empty", "chance": 0.1}],
+    }
+    for name, material_reactions in reactions.items():
+        materials.by_id[name].reactions = material_reactions
+    materials.compile()
+    assert materials.has_reactions
+    return materials
+
+def setup_reactions(simulation, rng):
+    simulation.paint_mask(0, HEIGHT // 2, np.ones((HEIGHT // 2, WIDTH), dtype=bool), material_id("water"))
+    simulation.paint_mask(WIDTH // 4, 4, np.ones((HEIGHT // 4, WIDTH // 4), dtype=bool), material_id("lava"))
+    simulation.paint_mask(WIDTH // 2, 4, np.ones((HEIGHT // 4, WIDTH // 4), dtype=bool), material_id("dust"))
+    return None
+
+def run(backend, setup, seed, materials=None, workers=0):
+    simulation = Simulation(WIDTH, HEIGHT, seed=seed, workers=workers, heat_interval=2, backend=backend)
+    if materials is not None:
+        simulation.materials = materials
+    per_tick = setup(simulation, np.random.default_rng(seed))
+    for tick in range(TICKS):
+        if per_tick is not None:
+            per_tick(tick)
+        simulation.step()
+    simulation.close()
+    return simulation.grid
+
+def assert_identical(expected, actual):
+    for name, plane, other in zip(PLANES, expected.planes(), actual.planes()):
+        assert np.array_equal(plane, other), f"{name} planes differ"
+
+@pytest.mark.parametrize("scenario", sorted(SCENARIOS))
+@pytest.mark.parametrize("seed", [1, 2 ** 32 - 1])
+def test_scenarios_match(numba_backend, scenario, seed):
+    setup = SCENARIOS[scenario]
+    assert_identical(run(numpy_backend, setup, seed), run(numba_backend, setup, seed))
+
+@pytest.mark.parametrize("seed", [1, 7, 2 ** 32 - 1])
+def test_reactions_match(numba_backend, reacting_materials, seed):
+    expected = run(numpy_backend, setup_reactions, seed, reacting_materials)
+    # Only the dust reaction removes dust, so fewer of it means reactions ran
+    assert np.count_nonzero(expected.material == material_id("dust")) < (HEIGHT // 4) * (WIDTH // 4)
+    assert_identical(expected, run(numba_backend, setup_reactions, seed, reacting_materials))
+
+def test_threaded_reactions_match(numba_backend, reacting_materials):
+    expected = run(numpy_backend, setup_reactions, 3, reacting_materials)
+    assert_identical(expected, run(numba_backend, setup_reactions, 3, reacting_materials, workers=4))
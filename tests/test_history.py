@@ -0,0 +1,65 @@
+# ./tests/test_history.py
+import numpy as np
+from src.simulation import Simulation, material_id
+
+def snapshot(simulation):
+    return [plane.copy() for plane in simulation.grid.planes()]
+
+def assert_grid(simulation, expected):
+    for plane, other in zip(simulation.grid.planes(), expected):
+        assert np.array_equal(plane, other)
+
+def settled_world():
+    simulation = Simulation(160, 120, seed=1)
+    simulation.paint_mask(0, 100, np.ones((20, 160), dtype=bool), material_id("stone"))
+    for _ in range(5):
+        simulation.step()
+    return simulation
+
+def paint(simulation, x, y, radius, material):
+    simulation.begin_edit()
+    simulation.paint(x, y, radius, material)
+    simulation.end_edit()
+
+def test_undo_rewinds_particles_that_moved_after_the_paint():
+    simulation = settled_world()
+    before = snapshot(simulation)
+    paint(simulation, 40, 10, 8, material_id("dust"))
+    for _ in range(200):
+        simulation.step()
+    after = snapshot(simulation)
+    simulation.undo()
+    assert_grid(simulation, before)
+    simulation.redo()
+    assert_grid(simulation, after)
+
+def test_undo_only_rewinds_the_latest_edit():
+    simulation = settled_world()
+    paint(simulation, 40, 10, 8, material_id("dust"))
+    for _ in range(100):
+        simulation.step()
+    middle = snapshot(simulation)
+    paint(simulation, 120, 10, 8, material_id("water"))
+    for _ in range(100):
+        simulation.step()
+    simulation.undo()
+    # The dust kept settling after the water was painted, so only the water's
+    # chunks are rewound to exactly how they were
+    assert not np.any(simulation.grid.material == material_id("water"))
+    assert np.count_nonzero(simulation.grid.material == material_id("dust")) == np.count_nonzero(middle[0] == material_id("dust"))
+
+def test_empty_edit_is_not_an_undo_step():
+    simulation = settled_world()
+    paint(simulation, 40, 10, 8, material_id("dust"))
+    # Painting only fills empty cells, so this lands nothing
+    paint(simulation, 80, 110, 4, material_id("dust"))
+    assert len(simulation.history.undo_stack) == 1
+
+def test_budget_evicts_oldest_first():
+    simulation = settled_world()
+    for x in (20, 60, 100, 140):
+        paint(simulation, x, 10, 6, material_id("stone"))
+    first = simulation.history.undo_stack[0]
+    simulation.history.set_budget(simulation.history.size - 1)
+    assert first not in simulation.history.undo_stack
+    assert len(simulation.history.undo_stack) == 3
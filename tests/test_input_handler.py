@@ -0,0 +1,39 @@
+# ./tests/test_input_handler.py
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+import pytest
+from src.input_handler import InputHandler
+
+@pytest.fixture
+def handler():
+    pygame.display.init()
+    handler = InputHandler()
+    # As the game does for presses outside the palette
+    handler.on(pygame.MOUSEBUTTONDOWN, lambda event: handler.begin_stroke(event.pos))
+    yield handler
+    pygame.display.quit()
+
+def press(pos):
+    return pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=pos, button=1)
+
+def release(pos):
+    return pygame.event.Event(pygame.MOUSEBUTTONUP, pos=pos, button=1)
+
+def drag(pos):
+    return pygame.event.Event(pygame.MOUSEMOTION, pos=pos, rel=(0, 0), buttons=(True, False, False))
+
+def test_two_strokes_in_one_frame_are_both_kept(handler):
+    handler.handle_events([press((10, 10)), drag((20, 10)), release((20, 10)),
+                           press((50, 50)), drag((60, 50))], None)
+    assert handler.take_strokes() == [[(10, 10), (20, 10)], [(50, 50), (60, 50)]]
+    # The held stroke carries its last point into the next frame
+    handler.handle_events([drag((70, 50)), release((70, 50))], None)
+    assert handler.take_strokes() == [[(60, 50), (70, 50)]]
+    assert handler.take_strokes() == []
+
+def test_a_held_still_mouse_keeps_painting(handler):
+    handler.handle_events([press((10, 10))], None)
+    assert handler.take_strokes() == [[(10, 10)]]
+    assert handler.take_strokes() == [[(10, 10)]]
@@ -0,0 +1,51 @@
+# ./tests/test_renderer.py
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+import pytest
+from src.simulation import Simulation, material_id
+from src.renderer import Renderer
+
+CELL_SIZE = 4
+
+@pytest.fixture(autouse=True)
+def display():
+    pygame.display.init()
+    yield
+    pygame.display.quit()
+
+def falling_world(width, height, ticks=60):
+    simulation = Simulation(width // CELL_SIZE, height // CELL_SIZE, seed=1)
+    renderer = Renderer(simulation.grid.width, simulation.grid.height)
+    for tick in range(ticks):
+        if tick % 10 == 0:
+            for i in range(6):
+                simulation.paint(20 + i * 25, 10, 4, material_id("dust" if i % 2 else "water"))
+        simulation.step()
+        yield simulation, renderer
+
+def pixels(surface):
+    return pygame.surfarray.array3d(surface)
+
+@pytest.mark.parametrize("size", [(800, 600), (803, 601), (1001, 703), (1366, 768)])
+def test_partial_present_matches_full_present(size):
+    screen = pygame.Surface(size)
+    for simulation, renderer in falling_world(*size):
+        rects = [renderer.cells_to_screen(rect, size) for rect in renderer.draw(simulation.grid, simulation.chunks)]
+        renderer.present(screen, rects)
+    full = pygame.Surface(size)
+    pygame.transform.scale(renderer.world_surface, size, full)
+    assert np.array_equal(pixels(screen), pixels(full))
+
+@pytest.mark.parametrize("size", [(803, 601), (1919, 1079)])
+def test_tiled_present_matches_full_present(size):
+    *_, (simulation, renderer) = falling_world(*size, ticks=20)
+    renderer.draw(simulation.grid, simulation.chunks)
+    tiles = [pygame.Rect(x, y, 37, 29) for x in range(0, size[0], 37) for y in range(0, size[1], 29)]
+    tiled = pygame.Surface(size)
+    renderer.present(tiled, tiles)
+    full = pygame.Surface(size)
+    pygame.transform.scale(renderer.world_surface, size, full)
+    assert np.array_equal(pixels(tiled), pixels(full))
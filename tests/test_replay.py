@@ -0,0 +1,56 @@
+# ./tests/test_replay.py
+import pygame
+import pytest
+from src.replay import ReplayReader, ReplayRecorder
+
+EVENTS = [
+    pygame.event.Event(pygame.VIDEORESIZE, size=(1024, 768), w=1024, h=768),
+    pygame.event.Event(pygame.MOUSEMOTION, pos=(-3, 70000), rel=(4, 5), buttons=(True, False, True)),
+    pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(12, 34), button=1),
+    pygame.event.Event(pygame.MOUSEBUTTONUP, pos=(56, 78), button=3),
+    pygame.event.Event(pygame.MOUSEWHEEL, x=0, y=-2, flipped=False),
+    pygame.event.Event(pygame.KEYDOWN, key=pygame.K_z, mod=pygame.KMOD_LCTRL, unicode="\x1a"),
+    pygame.event.Event(pygame.KEYUP, key=pygame.K_F9, mod=0, unicode=""),
+    pygame.event.Event(pygame.WINDOWFOCUSGAINED),
+    pygame.event.Event(pygame.QUIT),
+]
+# The attributes the game reads from each event type
+ATTRIBUTES = {
+    pygame.VIDEORESIZE: ("size", "w", "h"),
+    pygame.MOUSEMOTION: ("pos", "buttons"),
+    pygame.MOUSEBUTTONDOWN: ("pos", "button"),
+    pygame.MOUSEBUTTONUP: ("pos", "button"),
+    pygame.MOUSEWHEEL: ("x", "y"),
+    pygame.KEYDOWN: ("key", "mod", "unicode"),
+    pygame.KEYUP: ("key", "mod", "unicode"),
+}
+
+def test_event_log_round_trip(tmp_path):
+    path = tmp_path / "session.rpl"
+    metadata = {"seed": 7, "window": [800, 600]}
+    recorder = ReplayRecorder(path, metadata)
+    recorder.record_frame(EVENTS, 2, 15)
+    # Events the log has no code for are dropped
+    recorder.record_frame([pygame.event.Event(pygame.USEREVENT)], 0)
+    recorder.record_frame([], 65535, 2 ** 32 - 1)
+    recorder.close()
+
+    reader = ReplayReader(path)
+    assert reader.metadata == metadata
+    events, ticks, chunks = reader.next_frame()
+    assert (ticks, chunks) == (2, 15)
+    assert [event.type for event in events] == [event.type for event in EVENTS]
+    for original, decoded in zip(EVENTS, events):
+        for name in ATTRIBUTES.get(original.type, ()):
+            assert getattr(decoded, name) == getattr(original, name), (pygame.event.event_name(original.type), name)
+    assert reader.next_frame() == ([], 0, 0)
+    assert reader.next_frame() == ([], 65535, 2 ** 32 - 1)
+    assert reader.frame == 2
+    assert reader.next_frame() is None
+    reader.close()
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / "session.rpl"
+    path.write_bytes(b"NOTREPLAY" + bytes(16))
+    with pytest.raises(ValueError):
+        ReplayReader(path)
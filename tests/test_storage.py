@@ -0,0 +1,82 @@
+# ./tests/test_storage.py
+import os
+import time
+import tomllib
+import pytest
+import src.storage
+from src.storage import Storage
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(src.storage, "user_config_dir", lambda app_name: str(tmp_path))
+    return Storage(debounce=0.2)
+
+def saved(storage):
+    with open(storage.config_file, "rb") as f:
+        return tomllib.load(f)
+
+def wait_until_written(storage, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while storage.dirty and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # The writer clears dirty just before it writes; take the write lock to
+    # wait for that write to finish
+    with storage.write_lock:
+        pass
+
+def count_writes(storage, monkeypatch):
+    writes = []
+    write = storage.write_settings_file
+
+    def counted(settings):
+        writes.append(settings)
+        write(settings)
+
+    monkeypatch.setattr(storage, "write_settings_file", counted)
+    return writes
+
+def test_burst_of_changes_is_one_write(storage, monkeypatch):
+    writes = count_writes(storage, monkeypatch)
+    for size in range(10, 20):
+        storage.set_setting(size, "cursor", "size")
+    assert writes == []
+    wait_until_written(storage)
+    assert len(writes) == 1
+    assert saved(storage)["cursor"]["size"] == 19
+
+def test_failed_write_keeps_the_old_file_and_the_changes(storage, monkeypatch):
+    storage.persist = False
+    storage.set_setting(42, "cursor", "size")
+    storage.persist = True
+    before = saved(storage)
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(src.storage.tomli_w, "dump", fail)
+    with pytest.raises(OSError):
+        storage.flush()
+    assert saved(storage) == before
+    assert os.listdir(storage.config_dir) == ["settings.toml"]
+    assert storage.dirty
+
+    monkeypatch.undo()
+    storage.flush()
+    assert saved(storage)["cursor"]["size"] == 42
+    assert not storage.dirty
+
+def test_writer_retries_on_the_next_change_after_a_failure(storage, monkeypatch):
+    attempts = []
+
+    def fail(settings, f):
+        attempts.append(settings)
+        raise OSError("read-only file system")
+
+    monkeypatch.setattr(src.storage.tomli_w, "dump", fail)
+    storage.set_setting(30, "cursor", "size")
+    time.sleep(storage.debounce * 4)
+    assert len(attempts) == 1
+    assert storage.dirty
+    storage.set_setting(31, "cursor", "size")
+    time.sleep(storage.debounce * 4)
+    assert len(attempts) == 2
@@ -0,0 +1,82 @@
+# ./tests/test_world_file.py
+import numpy as np
+import pytest
+from src.simulation import LOAD_ERRORS, Simulation, WorldFile, WorldLoader, material_id, save_world
+from src.simulation.world_file import HEADER
+
+def world(width=150, height=100):
+    simulation = Simulation(width, height, seed=1)
+    simulation.paint_mask(0, 70, np.ones((30, width), dtype=bool), material_id("water"))
+    simulation.paint(40, 20, 10, material_id("lava"))
+    simulation.paint(100, 20, 10, material_id("dust"))
+    for _ in range(10):
+        simulation.step()
+    return simulation
+
+def load(path, simulation):
+    loader = WorldLoader(WorldFile(path), simulation)
+    assert loader.load(budget=float("inf"))
+    return simulation
+
+def test_save_load_round_trip(tmp_path):
+    path = tmp_path / "world.ppw"
+    saved = world()
+    save_world(path, saved.grid)
+    loaded = load(path, Simulation(10, 10, seed=1))
+    assert (loaded.grid.width, loaded.grid.height) == (saved.grid.width, saved.grid.height)
+    assert np.array_equal(loaded.grid.material, saved.grid.material)
+    assert np.array_equal(loaded.grid.temperature, saved.grid.temperature)
+
+def test_streaming_load_matches_one_shot_load(tmp_path):
+    path = tmp_path / "world.ppw"
+    saved = world(300, 200)
+    save_world(path, saved.grid, chunk_size=16)
+    loader = WorldLoader(WorldFile(path), Simulation(10, 10, seed=1))
+    frames = 1
+    while not loader.load(budget=0.0):
+        frames += 1
+    assert frames > 1
+    assert np.array_equal(loader.simulation.grid.material, saved.grid.material)
+
+@pytest.mark.parametrize("damage", ["empty", "truncated_header", "bad_magic", "bad_version", "truncated_table"])
+def test_bad_header_raises_load_error(tmp_path, damage):
+    path = tmp_path / "world.ppw"
+    save_world(path, world().grid)
+    data = bytearray(path.read_bytes())
+    if damage == "empty":
+        data = b""
+    elif damage == "truncated_header":
+        data = data[:HEADER.size - 2]
+    elif damage == "bad_magic":
+        data[:8] = b"NOTWORLD"
+    elif damage == "bad_version":
+        data[8] = 99
+    else:
+        data = data[:HEADER.size + 20]
+    path.write_bytes(bytes(data))
+    with pytest.raises(LOAD_ERRORS):
+        WorldFile(path)
+
+def test_corrupt_chunk_is_skipped(tmp_path):
+    path = tmp_path / "world.ppw"
+    saved = world()
+    save_world(path, saved.grid)
+    # Truncate inside the compressed chunk data; the table is still whole
+    data = path.read_bytes()
+    path.write_bytes(data[:len(data) - 200])
+    loaded = load(path, Simulation(10, 10, seed=1))
+    assert loaded.grid.material.shape == saved.grid.material.shape
+    assert 0 < loaded.count_particles() < saved.count_particles()
+
+def test_limit_reads_exactly_that_many_chunks(tmp_path):
+    path = tmp_path / "world.ppw"
+    saved = world()
+    save_world(path, saved.grid, chunk_size=16)
+    loader = WorldLoader(WorldFile(path), Simulation(10, 10, seed=1))
+    total = len(loader.pending)
+    assert not loader.load(budget=float("inf"), limit=5)
+    assert loader.read == 5
+    assert not loader.load(budget=float("inf"), limit=0)
+    assert loader.read == 5
+    assert loader.load(budget=float("inf"), limit=total - 5)
+    assert np.array_equal(loader.simulation.grid.material, saved.grid.material)